@@ -0,0 +1,125 @@
+"""Side-by-side comparison of datasets from their cached per-dataset aggregates.
+
+Every input is a summary that already exists per dataset (the mergeable
+sketches, the monthly timeline and the key insights), so comparing datasets
+never touches their reviews. The first dataset is the baseline; every other
+one gets its deltas against it. Counts are compared as shares of each
+dataset's reviews, so datasets of different sizes line up.
+"""
+from .sketches import ReviewAggregates
+
+
+def _pct(count: int, total: int) -> float:
+    return round(count / total * 100, 2) if total else 0.0
+
+
+def _shares(counts: dict[str, int], total: int) -> dict[str, float]:
+    return {key: _pct(value, total) for key, value in counts.items()}
+
+
+def _share_deltas(base: dict[str, float], other: dict[str, float]) -> dict[str, float]:
+    return {key: round(other.get(key, 0.0) - base.get(key, 0.0), 2) for key in sorted(base.keys() | other.keys())}
+
+
+def _word_deltas(base: ReviewAggregates, other: ReviewAggregates, top_n: int) -> dict[str, list[dict]]:
+    """Change in occurrences per 1000 reviews of the top words of either dataset.
+
+    A word that is frequent in only one dataset is still estimated in the
+    other from its count-min sketch, which covers every word seen.
+    """
+    deltas = {}
+    for label, sketch in base.words.items():
+        other_sketch = other.words[label]
+        words = list(dict.fromkeys(
+            [w for w, _ in sketch.most_common(top_n)] + [w for w, _ in other_sketch.most_common(top_n)]
+        ))
+        if not words:
+            deltas[label] = []
+            continue
+        base_rate = sketch.estimate(words) * 1000 / max(base.rows, 1)
+        other_rate = other_sketch.estimate(words) * 1000 / max(other.rows, 1)
+        entries = [
+            {
+                "word": word,
+                "baseline_per_1000": round(float(b), 2),
+                "per_1000": round(float(o), 2),
+                "delta": round(float(o - b), 2),
+            }
+            for word, b, o in zip(words, base_rate, other_rate)
+        ]
+        entries.sort(key=lambda e: (-abs(e["delta"]), e["word"]))
+        deltas[label] = entries[:top_n]
+    return deltas
+
+
+def _timeline_deltas(base: list[dict], other: list[dict]) -> list[dict]:
+    """Both timelines on their union of periods, with deltas where both have data."""
+    base_by_period = {point["period"]: point for point in base}
+    other_by_period = {point["period"]: point for point in other}
+    points = []
+    for period in sorted(base_by_period.keys() | other_by_period.keys()):
+        b, o = base_by_period.get(period), other_by_period.get(period)
+        point = {
+            "period": period,
+            "baseline_avg_sentiment": b["avg_sentiment"] if b else None,
+            "avg_sentiment": o["avg_sentiment"] if o else None,
+            "baseline_positive": b["positive"] if b else None,
+            "positive": o["positive"] if o else None,
+        }
+        point["delta_avg_sentiment"] = round(o["avg_sentiment"] - b["avg_sentiment"], 3) if b and o else None
+        point["delta_positive"] = round(o["positive"] - b["positive"], 1) if b and o else None
+        points.append(point)
+    return points
+
+
+def _insight_deltas(base: dict, other: dict) -> dict[str, dict]:
+    """Praises and complaints that appear in only one of the datasets, or in both."""
+    deltas = {}
+    for kind in ("praises", "complaints"):
+        base_items = {item["text"].lower(): item for item in base.get(kind, [])}
+        other_items = {item["text"].lower(): item for item in other.get(kind, [])}
+        deltas[kind] = {
+            "new": [item for key, item in other_items.items() if key not in base_items],
+            "gone": [item for key, item in base_items.items() if key not in other_items],
+            "shared": [item for key, item in other_items.items() if key in base_items],
+        }
+    return deltas
+
+
+def dataset_snapshot(file_id: str, filename: str | None, aggregates: ReviewAggregates) -> dict:
+    summary = aggregates.summary(top_n=0)
+    total = aggregates.rows
+    return {
+        "file_id": file_id,
+        "filename": filename,
+        "overview": summary["overview"],
+        "rating_distribution": _shares(summary["rating_distribution"], total),
+        "sentiment_breakdown": _shares(summary["sentiment_breakdown"], total),
+    }
+
+
+def compare_datasets(datasets: list[dict], top_n: int = 15) -> dict:
+    """Compare datasets, the first being the baseline.
+
+    Every entry holds ``file_id``, ``filename``, ``aggregates``
+    (a ``ReviewAggregates``), ``timeline`` (a list of timeline points, empty
+    without dates) and ``insights`` (as returned by ``extract_key_insights``).
+    """
+    snapshots = [dataset_snapshot(d["file_id"], d["filename"], d["aggregates"]) for d in datasets]
+    base, base_snapshot = datasets[0], snapshots[0]
+    comparisons = []
+    for entry, snapshot in zip(datasets[1:], snapshots[1:]):
+        overview = {
+            key: round(snapshot["overview"][key] - base_snapshot["overview"][key], 3)
+            for key in ("total_reviews", "avg_rating", "sentiment_score", "fake_review_percentage")
+        }
+        comparisons.append({
+            "file_id": entry["file_id"],
+            "overview": overview,
+            "rating_distribution": _share_deltas(base_snapshot["rating_distribution"], snapshot["rating_distribution"]),
+            "sentiment_breakdown": _share_deltas(base_snapshot["sentiment_breakdown"], snapshot["sentiment_breakdown"]),
+            "sentiment_timeline": _timeline_deltas(base["timeline"], entry["timeline"]),
+            "word_frequencies": _word_deltas(base["aggregates"], entry["aggregates"], top_n),
+            "key_insights": _insight_deltas(base["insights"], entry["insights"]),
+        })
+    return {"baseline": base["file_id"], "datasets": snapshots, "deltas": comparisons}
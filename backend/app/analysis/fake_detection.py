@@ -1,68 +1,262 @@
+import threading
+from collections import OrderedDict, deque
+
 import numpy as np
 import pandas as pd
 
+from ..utils.data_processing import get_product_column
+from ..utils.parallel import map_texts
 
-def detect_fake_reviews(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["fake_score"] = 0.0
-    df["fake_reasons"] = [[] for _ in range(len(df))]
+# Review burst parameters: a burst is at least BURST_MIN_REVIEWS same-rating reviews
+# of one product inside BURST_WINDOW_DAYS, arriving BURST_RATIO times faster than
+# that product/rating pair did over the preceding BURST_BASELINE_DAYS.
+BURST_WINDOW_DAYS = 2
+BURST_BASELINE_DAYS = 30
+BURST_MIN_REVIEWS = 5
+BURST_RATIO = 3.0
+# Product/rating streams a live detector keeps, least recently updated dropped first
+BURST_MAX_STREAMS = 100_000
 
-    # 1) Very short reviews (< 20 chars)
-    short_mask = df["review_text"].str.len() < 20
-    df.loc[short_mask, "fake_score"] += 0.3
-    for idx in df.index[short_mask]:
-        df.at[idx, "fake_reasons"].append("Very short review")
 
-    # 2) Sentiment-rating mismatch
-    if "sentiment_score" in df.columns:
-        # Positive sentiment but low rating
-        mismatch1 = (df["sentiment_score"] > 0.5) & (df["rating"] <= 2)
-        df.loc[mismatch1, "fake_score"] += 0.35
-        for idx in df.index[mismatch1]:
-            df.at[idx, "fake_reasons"].append("Positive text but low rating")
-
-        # Negative sentiment but high rating
-        mismatch2 = (df["sentiment_score"] < -0.5) & (df["rating"] >= 4)
-        df.loc[mismatch2, "fake_score"] += 0.35
-        for idx in df.index[mismatch2]:
-            df.at[idx, "fake_reasons"].append("Negative text but high rating")
+def _burst_score(window_count, baseline_count, window_days: int, baseline_days: int,
+                 min_reviews: int, ratio: float):
+    """Burst strength in [0, 1] from window and baseline counts; 0 means no burst."""
+    baseline_rate = np.maximum(np.asarray(baseline_count) * window_days / baseline_days, 1.0)
+    strength = np.asarray(window_count) / baseline_rate
+    flagged = (np.asarray(window_count) >= min_reviews) & (strength >= ratio)
+    return np.where(flagged, np.minimum(1.0, strength / (2 * ratio)), 0.0).round(3)
 
-    # 3) Extreme sentiment (very robotic / over-the-top)
-    if "sentiment_score" in df.columns:
-        extreme = df["sentiment_score"].abs() > 0.95
-        df.loc[extreme, "fake_score"] += 0.15
-        for idx in df.index[extreme]:
-            df.at[idx, "fake_reasons"].append("Extremely polarized sentiment")
 
-    # 4) All caps text
-    caps_ratio = df["review_text"].apply(
-        lambda x: sum(1 for c in x if c.isupper()) / max(len(x), 1)
+def _today() -> int:
+    return int(np.datetime64("today", "D").astype(np.int64))
+
+
+class BurstDetector:
+    """Streaming review-burst detector.
+
+    Keeps two sliding windows of day numbers per (product, rating): the burst
+    window (t - window, t] and the baseline (t - window - baseline, t - window].
+    Every timestamp enters, moves and leaves each window once, so updates are
+    amortized O(1).
+
+    Reviews of a product/rating pair must arrive in date order: one dated before
+    the newest day of its stream is neither counted nor scored (0.0), since the
+    history it would be measured against has already been dropped. Neither is one
+    dated more than a day in the future, which would age out every stream. Streams are
+    forgotten once their newest day falls out of the window plus baseline of the
+    newest day seen overall, and beyond ``max_streams`` the least recently
+    updated go first, so memory stays bounded whatever products clients send.
+    """
+
+    def __init__(self, window_days: int = BURST_WINDOW_DAYS, baseline_days: int = BURST_BASELINE_DAYS,
+                 min_reviews: int = BURST_MIN_REVIEWS, ratio: float = BURST_RATIO,
+                 max_streams: int = BURST_MAX_STREAMS):
+        self.window_days = window_days
+        self.baseline_days = baseline_days
+        self.min_reviews = min_reviews
+        self.ratio = ratio
+        self.max_streams = max_streams
+        self._streams: OrderedDict[tuple[str, int], tuple[deque, deque]] = OrderedDict()
+        self._newest_day: int | None = None
+
+    def update(self, product, rating: int, date) -> float:
+        """Add one review and return its burst score (0.0 when not part of a burst)."""
+        day = int(pd.Timestamp(date).to_datetime64().astype("datetime64[D]").astype(np.int64))
+        if day > _today() + 1:
+            return 0.0
+        key = (str(product), int(rating))
+        window, baseline = self._streams.setdefault(key, (deque(), deque()))
+        if window and day < window[-1]:
+            return 0.0
+        self._streams.move_to_end(key)
+        while window and window[0] <= day - self.window_days:
+            baseline.append(window.popleft())
+        while baseline and baseline[0] <= day - self.window_days - self.baseline_days:
+            baseline.popleft()
+        window.append(day)
+        self._newest_day = day if self._newest_day is None else max(self._newest_day, day)
+        self._prune()
+        return float(_burst_score(len(window), len(baseline), self.window_days,
+                                  self.baseline_days, self.min_reviews, self.ratio))
+
+    def _prune(self):
+        """Drop streams from the least recently updated end while they are over the cap or
+        hold nothing a review on or after the newest day could still count."""
+        horizon = self._newest_day - self.window_days - self.baseline_days
+        while self._streams:
+            window, _ = next(iter(self._streams.values()))
+            if len(self._streams) <= self.max_streams and window[-1] > horizon:
+                break
+            self._streams.popitem(last=False)
+
+
+def detect_bursts(df: pd.DataFrame, product_col: str, window_days: int = BURST_WINDOW_DAYS,
+                  baseline_days: int = BURST_BASELINE_DAYS, min_reviews: int = BURST_MIN_REVIEWS,
+                  ratio: float = BURST_RATIO) -> np.ndarray:
+    """Burst score for every row, identical to feeding the rows to ``BurstDetector``
+    in date order.
+
+    Rows are sorted once by (product, rating, day); each (product, rating) stream is
+    offset onto its own stretch of the number line so the window edges of all
+    streams are found with a single vectorized ``searchsorted``.
+    """
+    scores = np.zeros(len(df))
+    valid = (df["date"].notna() & df[product_col].notna()).to_numpy()
+    if not valid.any():
+        return scores
+
+    rows = np.flatnonzero(valid)
+    days = df["date"].to_numpy()[rows].astype("datetime64[D]").astype(np.int64)
+    streams = pd.MultiIndex.from_arrays(
+        [df[product_col].to_numpy()[rows].astype(str), df["rating"].to_numpy()[rows]]
+    )
+    stream_id = streams.codes[0].astype(np.int64) * len(streams.levels[1]) + streams.codes[1]
+
+    order = np.lexsort((rows, days, stream_id))
+    days, stream_id = days[order], stream_id[order]
+    span = days.max() - days.min() + window_days + baseline_days + 1
+    key = stream_id * span + (days - days.min())
+
+    pos = np.arange(len(key))
+    window_start = np.searchsorted(key, key - window_days, side="right")
+    baseline_start = np.searchsorted(key, key - window_days - baseline_days, side="right")
+    scores[rows[order]] = _burst_score(pos - window_start + 1, window_start - baseline_start,
+                                       window_days, baseline_days, min_reviews, ratio)
+    return scores
+
+
+# Reviews scoring at least this are reported as suspicious
+FAKE_THRESHOLD = 0.3
+
+
+def _caps_ratio(text: str) -> float:
+    return sum(map(str.isupper, text)) / max(len(text), 1)
+
+
+def _has_repetition(text: str) -> bool:
+    words = text.lower().split()
+    if len(words) < 3:
+        return False
+    unique_ratio = len(set(words)) / len(words)
+    return unique_ratio < 0.4
+
+
+def review_features(texts, ratings, sentiment_scores=None) -> dict[str, np.ndarray]:
+    """Per-review inputs of the fake-review rules; sentiment scores are NaN when unknown,
+    which makes the sentiment rules never fire."""
+    texts = [t if isinstance(t, str) else str(t) for t in texts]
+    n = len(texts)
+    length, caps_ratio, repetitive = map_texts("fake_features", texts)
+    return {
+        "length": length,
+        "rating": np.asarray(ratings, dtype=np.float64),
+        "sentiment_score": (
+            np.full(n, np.nan) if sentiment_scores is None else np.asarray(sentiment_scores, dtype=np.float64)
+        ),
+        "caps_ratio": caps_ratio,
+        "repetitive": repetitive,
+    }
+
+
+def text_features(texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Length, capitalization ratio and repetition flag of every text."""
+    n = len(texts)
+    return (
+        np.fromiter(map(len, texts), dtype=np.int64, count=n),
+        np.fromiter(map(_caps_ratio, texts), dtype=np.float64, count=n),
+        np.fromiter(map(_has_repetition, texts), dtype=bool, count=n),
     )
-    caps_mask = caps_ratio > 0.6
-    df.loc[caps_mask, "fake_score"] += 0.2
-    for idx in df.index[caps_mask]:
-        df.at[idx, "fake_reasons"].append("Excessive capitalization")
 
+
+# Rules shared by batch scoring (detect_fake_reviews) and real-time scoring (score_reviews):
+# (reason, weight added to the fake score, test over review_features)
+FAKE_RULES = [
+    # 1) Very short reviews (< 20 chars)
+    ("Very short review", 0.3, lambda f: f["length"] < 20),
+    # 2) Sentiment-rating mismatch
+    ("Positive text but low rating", 0.35, lambda f: (f["sentiment_score"] > 0.5) & (f["rating"] <= 2)),
+    ("Negative text but high rating", 0.35, lambda f: (f["sentiment_score"] < -0.5) & (f["rating"] >= 4)),
+    # 3) Extreme sentiment (very robotic / over-the-top)
+    ("Extremely polarized sentiment", 0.15, lambda f: np.abs(f["sentiment_score"]) > 0.95),
+    # 4) All caps text
+    ("Excessive capitalization", 0.2, lambda f: f["caps_ratio"] > 0.6),
     # 5) Repetitive characters / words
-    def has_repetition(text: str) -> bool:
-        words = text.lower().split()
-        if len(words) < 3:
-            return False
-        unique_ratio = len(set(words)) / len(words)
-        return unique_ratio < 0.4
+    ("Repetitive content", 0.25, lambda f: f["repetitive"]),
+]
+# 6) Burst of same-rating reviews for one product in a short window
+BURST_REASON, BURST_WEIGHT = "Review burst", 0.3
+
 
-    rep_mask = df["review_text"].apply(has_repetition)
-    df.loc[rep_mask, "fake_score"] += 0.25
-    for idx in df.index[rep_mask]:
-        df.at[idx, "fake_reasons"].append("Repetitive content")
+def apply_fake_rules(features: dict[str, np.ndarray], burst_scores=None) -> tuple[np.ndarray, list[list[str]]]:
+    """Fake score in [0, 1] and the reasons behind it for every review."""
+    n = len(features["length"])
+    scores = np.zeros(n)
+    reasons: list[list[str]] = [[] for _ in range(n)]
+    rules = [(reason, weight, test(features)) for reason, weight, test in FAKE_RULES]
+    if burst_scores is not None:
+        rules.append((BURST_REASON, BURST_WEIGHT, np.asarray(burst_scores) > 0))
+    for reason, weight, mask in rules:
+        scores[mask] += weight
+        for i in np.flatnonzero(mask):
+            reasons[i].append(reason)
+    return np.clip(scores, 0, 1).round(3), reasons
 
-    # Clip score to [0, 1]
-    df["fake_score"] = df["fake_score"].clip(0, 1).round(3)
 
+def detect_fake_reviews(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    features = review_features(
+        df["review_text"], df["rating"], df["sentiment_score"] if "sentiment_score" in df.columns else None
+    )
+    burst_scores = None
+    product_col = get_product_column(df)
+    if product_col and "date" in df.columns:
+        df["burst_score"] = burst_scores = detect_bursts(df, product_col)
+    df["fake_score"], df["fake_reasons"] = apply_fake_rules(features, burst_scores)
     return df
 
 
-def get_suspicious_reviews(df: pd.DataFrame, threshold: float = 0.3, max_count: int = 50) -> list[dict]:
+# Burst state of reviews scored as they are submitted. It lives in this worker process, so
+# with several workers each one only sees the reviews routed to it
+_live_bursts = BurstDetector()
+_live_bursts_lock = threading.Lock()
+
+
+def score_reviews(reviews: list[dict]) -> list[dict]:
+    """Score incoming reviews with the same rules as ``detect_fake_reviews``.
+
+    Each review has ``text`` and ``rating`` and optionally ``sentiment_score``
+    (computed with VADER when missing), ``product_id`` and ``date``. Reviews with
+    a product feed this worker's streaming ``BurstDetector``, dated now when no
+    date is given.
+    """
+    from .sentiment import get_sentiment
+
+    sentiments = [
+        r["sentiment_score"] if r.get("sentiment_score") is not None else get_sentiment(r["text"])["score"]
+        for r in reviews
+    ]
+    features = review_features([r["text"] for r in reviews], [r["rating"] for r in reviews], sentiments)
+    burst_scores = None
+    if any(r.get("product_id") is not None for r in reviews):
+        burst_scores = np.zeros(len(reviews))
+        with _live_bursts_lock:
+            for i, r in enumerate(reviews):
+                if r.get("product_id") is not None:
+                    date = r.get("date") or pd.Timestamp.now()
+                    burst_scores[i] = _live_bursts.update(r["product_id"], r["rating"], date)
+    scores, reasons = apply_fake_rules(features, burst_scores)
+    return [
+        {
+            "fake_score": float(score),
+            "suspicious": bool(score >= FAKE_THRESHOLD),
+            "reasons": reason,
+            "sentiment_score": round(float(sentiment), 3),
+        }
+        for score, reason, sentiment in zip(scores, reasons, sentiments)
+    ]
+
+
+def get_suspicious_reviews(df: pd.DataFrame, threshold: float = FAKE_THRESHOLD, max_count: int = 50) -> list[dict]:
     suspicious = df[df["fake_score"] >= threshold].nlargest(max_count, "fake_score")
     results = []
     for idx, row in suspicious.iterrows():
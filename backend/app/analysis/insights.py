@@ -105,8 +105,21 @@ def _extract_distinctive_phrases(
     feature_names = vectorizer.get_feature_names_out()
 
     target_mask = np.array(labels) == 1
-    contrast_mask = ~target_mask
+    return _rank_distinctive_phrases(
+        tfidf_matrix, feature_names, target_mask, ~target_mask, target_texts, n=n
+    )
+
 
+def _rank_distinctive_phrases(
+    tfidf_matrix,
+    feature_names,
+    target_mask: np.ndarray,
+    contrast_mask: np.ndarray,
+    target_texts: list[str],
+    n: int = 8,
+) -> list[dict]:
+    """Rank n-grams of an already fitted TF-IDF matrix by how much more they occur
+    in the target rows than in the contrast rows."""
     target_mean = np.asarray(tfidf_matrix[target_mask].mean(axis=0)).flatten()
     if contrast_mask.any():
         contrast_mean = np.asarray(tfidf_matrix[contrast_mask].mean(axis=0)).flatten()
@@ -196,3 +209,58 @@ def extract_key_insights(positive_df, negative_df, n=8) -> dict:
         c["sentiment"] = "negative"
 
     return {"praises": praises, "complaints": complaints}
+
+
+def extract_key_insights_by_group(df, group_col: str, n: int = 3) -> dict[str, dict]:
+    """Extract praises and complaints for every group (e.g. product) of a dataset.
+
+    The TF-IDF vocabulary is fitted once over the whole dataset and each group
+    only slices its rows out of the shared matrix, instead of refitting per group.
+    """
+    texts = df["review_text"].tolist()
+    scores = df["sentiment_score"].to_numpy() if "sentiment_score" in df.columns else None
+    labels = df["sentiment"].to_numpy()
+    positive = labels == "positive"
+    negative = labels == "negative"
+    if scores is not None:
+        positive &= scores > 0.3
+        negative &= scores < -0.3
+
+    vectorizer = TfidfVectorizer(
+        ngram_range=(2, 3),
+        max_features=5000,
+        min_df=2,
+        max_df=0.8,
+        stop_words="english",
+        sublinear_tf=True,
+    )
+    try:
+        tfidf_matrix = vectorizer.fit_transform(texts)
+    except ValueError:
+        return {}
+    feature_names = vectorizer.get_feature_names_out()
+
+    results = {}
+    for key, rows in df.groupby(group_col, sort=False).indices.items():
+        pos_rows = rows[positive[rows]]
+        neg_rows = rows[negative[rows]]
+        group_matrix = tfidf_matrix[np.concatenate([pos_rows, neg_rows])]
+        is_pos = np.arange(len(pos_rows) + len(neg_rows)) < len(pos_rows)
+
+        praises, complaints = [], []
+        if len(pos_rows) >= 5:
+            praises = _rank_distinctive_phrases(
+                group_matrix, feature_names, is_pos, ~is_pos,
+                [texts[i] for i in pos_rows], n=n,
+            )
+        if len(neg_rows) >= 5:
+            complaints = _rank_distinctive_phrases(
+                group_matrix, feature_names, ~is_pos, is_pos,
+                [texts[i] for i in neg_rows], n=n,
+            )
+        for p in praises:
+            p["sentiment"] = "positive"
+        for c in complaints:
+            c["sentiment"] = "negative"
+        results[str(key)] = {"praises": praises, "complaints": complaints}
+    return results
@@ -1,3 +1,5 @@
+import threading
+
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import Ridge
@@ -6,21 +8,54 @@ from .sentiment import get_sentiment
 
 
 class RatingPredictor:
+    """Rating model shared by every request of a worker.
+
+    The fitted vectorizer and model are held in one state dict that is never
+    modified: training builds new ones, and a new state is published by
+    swapping that single reference. A concurrent ``predict`` therefore uses
+    either the previous model or the new one, never a half-fitted mix.
+    Every state carries a version (the shared store's version of it), and an
+    older state never replaces a newer one.
+    """
+
     def __init__(self):
-        self._vectorizer = TfidfVectorizer(max_features=3000, stop_words="english")
-        self._model = Ridge(alpha=1.0)
-        self._fitted = False
+        self._lock = threading.Lock()
+        self._state = {"vectorizer": None, "model": None, "fitted": False, "dataset_id": None, "version": 0}
+
+    @property
+    def dataset_id(self) -> str | None:
+        """file_id of the dataset the current model was trained on."""
+        return self._state["dataset_id"]
 
-    def fit(self, texts: list[str], ratings: list[int]):
+    @property
+    def version(self) -> int:
+        return self._state["version"]
+
+    def train(self, texts: list[str], ratings: list[int], dataset_id: str | None = None) -> dict | None:
+        """Fit a new vectorizer and model and return them as a state, without publishing it."""
         if len(texts) < 10:
-            return
-        X = self._vectorizer.fit_transform(texts)
-        self._model.fit(X, ratings)
-        self._fitted = True
+            return None
+        vectorizer = TfidfVectorizer(max_features=3000, stop_words="english")
+        model = Ridge(alpha=1.0)
+        model.fit(vectorizer.fit_transform(texts), ratings)
+        return {"vectorizer": vectorizer, "model": model, "fitted": True, "dataset_id": dataset_id}
+
+    def load_state(self, state: dict, version: int) -> bool:
+        """Publish ``state`` as ``version`` unless a newer one is already loaded."""
+        with self._lock:
+            if version <= self._state["version"]:
+                return False
+            self._state = {
+                "vectorizer": state["vectorizer"], "model": state["model"], "fitted": state["fitted"],
+                "dataset_id": state.get("dataset_id"), "version": version,
+            }
+            return True
 
     def predict(self, text: str) -> dict:
+        # One read of the state, so the vectorizer and model below always belong together
+        state = self._state
         sentiment = get_sentiment(text)
-        if not self._fitted:
+        if not state["fitted"]:
             # Fallback: estimate from sentiment
             predicted = 3.0 + sentiment["score"] * 2.0
             return {
@@ -30,8 +65,8 @@ class RatingPredictor:
                 "sentiment_score": round(sentiment["score"], 3),
             }
 
-        X = self._vectorizer.transform([text])
-        pred = self._model.predict(X)[0]
+        X = state["vectorizer"].transform([text])
+        pred = state["model"].predict(X)[0]
         pred = max(1.0, min(5.0, pred))
 
         # Simple confidence based on how close to integer
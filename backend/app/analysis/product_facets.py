@@ -0,0 +1,77 @@
+"""Per-product faceted analysis computed in one grouped pass over the enriched dataset."""
+import pandas as pd
+
+from .insights import extract_key_insights_by_group
+from .sentiment import build_daily_rollup, timelines_by_product
+from ..utils.data_processing import get_product_column
+
+
+def build_product_facets(
+    df: pd.DataFrame,
+    rollup: pd.DataFrame | None = None,
+    fake_threshold: float = 0.3,
+    n_insights: int = 3,
+) -> list[dict]:
+    """Build overview stats, sentiment breakdown, timeline, fake percentage and key
+    insights for every product.
+
+    Expects the per-row features added by ``analyze_sentiments`` and
+    ``detect_fake_reviews``; they are shared by all products, so nothing is
+    re-tokenized or re-scored per product. Timelines come from the per-product
+    daily rollup, which is built here if the caller has no cached one.
+    """
+    key = get_product_column(df)
+    if key is None:
+        return []
+    if rollup is None:
+        rollup = build_daily_rollup(df, product_col=key)
+
+    df = df[df[key].notna()]
+    features = pd.DataFrame({
+        "product": df[key].astype(str),
+        "rating": df["rating"],
+        "sentiment_score": df["sentiment_score"],
+        "positive": df["sentiment"] == "positive",
+        "negative": df["sentiment"] == "negative",
+        "neutral": df["sentiment"] == "neutral",
+        "fake": df["fake_score"] >= fake_threshold,
+    })
+    if "product_name" in df.columns and key != "product_name":
+        features["product_name"] = df["product_name"].astype(str)
+
+    grouped = features.groupby("product", sort=False)
+    stats = grouped.agg(
+        total_reviews=("rating", "size"),
+        avg_rating=("rating", "mean"),
+        sentiment_score=("sentiment_score", "mean"),
+        positive=("positive", "sum"),
+        negative=("negative", "sum"),
+        neutral=("neutral", "sum"),
+        fake=("fake", "sum"),
+    )
+    names = grouped["product_name"].first() if "product_name" in features.columns else None
+
+    timelines = timelines_by_product(rollup)
+    insights = extract_key_insights_by_group(df.assign(product=features["product"]), "product", n=n_insights)
+
+    facets = []
+    for product, row in stats.sort_values("total_reviews", ascending=False).iterrows():
+        total = int(row["total_reviews"])
+        facets.append({
+            "product_id": product,
+            "product_name": str(names[product]) if names is not None else product,
+            "overview": {
+                "total_reviews": total,
+                "avg_rating": round(float(row["avg_rating"]), 2),
+                "sentiment_score": round(float(row["sentiment_score"]), 3),
+                "fake_review_percentage": round(float(row["fake"]) / total * 100, 1) if total else 0.0,
+            },
+            "sentiment_breakdown": {
+                "positive": int(row["positive"]),
+                "negative": int(row["negative"]),
+                "neutral": int(row["neutral"]),
+            },
+            "sentiment_timeline": timelines.get(product, []),
+            "key_insights": insights.get(product, {"praises": [], "complaints": []}),
+        })
+    return facets
@@ -1,12 +1,22 @@
 import pandas as pd
 import numpy as np
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-_analyzer = SentimentIntensityAnalyzer()
+from ..utils.parallel import map_texts
+
+# Built on first use: loading the VADER lexicon is the slowest part of importing this module
+_analyzer = None
+
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
 
 
 def get_sentiment(text: str) -> dict:
-    scores = _analyzer.polarity_scores(text)
+    scores = _get_analyzer().polarity_scores(text)
     compound = scores["compound"]
     if compound >= 0.05:
         label = "positive"
@@ -17,11 +27,24 @@ def get_sentiment(text: str) -> dict:
     return {"score": compound, "label": label}
 
 
+def sentiment_scores(texts) -> np.ndarray:
+    """VADER compound score of every text."""
+    polarity = _get_analyzer().polarity_scores
+    return np.fromiter((polarity(t)["compound"] for t in texts), dtype=np.float64, count=len(texts))
+
+
+def sentiment_labels(scores) -> np.ndarray:
+    """The labels ``get_sentiment`` gives the same compound scores."""
+    scores = np.asarray(scores)
+    return np.where(scores >= 0.05, "positive", np.where(scores <= -0.05, "negative", "neutral"))
+
+
 def analyze_sentiments(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    results = df["review_text"].apply(get_sentiment)
-    df["sentiment_score"] = results.apply(lambda x: x["score"])
-    df["sentiment"] = results.apply(lambda x: x["label"])
+    # Scored on the process pool for large datasets (see utils.parallel)
+    scores = map_texts("sentiment", df["review_text"])
+    df["sentiment_score"] = scores
+    df["sentiment"] = pd.Series(sentiment_labels(scores), index=df.index, dtype="str")
     return df
 
 
@@ -48,23 +71,95 @@ def build_sentiment_timeline(df: pd.DataFrame) -> list[dict]:
             )
         return timeline
 
-    df_dated = df.dropna(subset=["date"]).copy()
-    df_dated = df_dated.sort_values("date")
-    df_dated["period"] = df_dated["date"].dt.to_period("M").astype(str)
-
-    timeline = []
-    for period, group in df_dated.groupby("period"):
-        total = len(group)
-        timeline.append(
-            {
-                "period": period,
-                "positive": round((group["sentiment"] == "positive").sum() / total * 100, 1),
-                "negative": round((group["sentiment"] == "negative").sum() / total * 100, 1),
-                "neutral": round((group["sentiment"] == "neutral").sum() / total * 100, 1),
-                "avg_sentiment": round(group["sentiment_score"].mean(), 3),
-            }
+    return timeline_from_rollup(build_daily_rollup(df), granularity="month")
+
+
+# Period frequencies a timeline can be bucketed by
+TIMELINE_GRANULARITIES = {"day": "D", "week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+
+
+def build_daily_rollup(df: pd.DataFrame, product_col: str | None = None) -> pd.DataFrame:
+    """Aggregate sentiment counts and score sums per day (and per product if given).
+
+    The rollup is small (days x products) and every coarser timeline can be derived
+    from it without touching the review rows again.
+    """
+    columns = ["day"] + (["product"] if product_col else []) + [
+        "total", "positive", "negative", "neutral", "score_sum",
+    ]
+    if "date" not in df.columns:
+        return pd.DataFrame(columns=columns)
+
+    dated = df[df["date"].notna()]
+    sentiment = dated["sentiment"]
+    frame = pd.DataFrame({
+        "day": dated["date"].dt.floor("D"),
+        "positive": sentiment == "positive",
+        "negative": sentiment == "negative",
+        "neutral": sentiment == "neutral",
+        "score": dated["sentiment_score"],
+    })
+    keys = ["day"]
+    if product_col:
+        frame["product"] = dated[product_col].astype(str)
+        keys.append("product")
+
+    rollup = frame.groupby(keys, sort=True).agg(
+        total=("score", "size"),
+        positive=("positive", "sum"),
+        negative=("negative", "sum"),
+        neutral=("neutral", "sum"),
+        score_sum=("score", "sum"),
+    )
+    return rollup.reset_index()[columns]
+
+
+def timeline_from_rollup(
+    rollup: pd.DataFrame, granularity: str = "month", product: str | None = None
+) -> list[dict]:
+    """Bucket a daily rollup into a week/month/quarter/year sentiment timeline."""
+    if granularity not in TIMELINE_GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(TIMELINE_GRANULARITIES)}")
+    if product is not None:
+        rollup = rollup[rollup["product"] == product]
+    if rollup.empty:
+        return []
+
+    period = rollup["day"].dt.to_period(TIMELINE_GRANULARITIES[granularity]).rename("period")
+    sums = rollup.groupby(period, sort=True)[["total", "positive", "negative", "neutral", "score_sum"]].sum()
+    return _timeline_points(sums)
+
+
+def timelines_by_product(rollup: pd.DataFrame, granularity: str = "month") -> dict[str, list[dict]]:
+    """Timelines for every product of a per-product rollup in one groupby."""
+    if rollup.empty or "product" not in rollup.columns:
+        return {}
+    period = rollup["day"].dt.to_period(TIMELINE_GRANULARITIES[granularity]).rename("period")
+    sums = rollup.groupby([rollup["product"], period], sort=True)[
+        ["total", "positive", "negative", "neutral", "score_sum"]
+    ].sum()
+    return {
+        product: _timeline_points(group.droplevel("product"))
+        for product, group in sums.groupby(level="product", sort=False)
+    }
+
+
+def _timeline_points(sums: pd.DataFrame) -> list[dict]:
+    total = sums["total"]
+    pct = sums[["positive", "negative", "neutral"]].div(total, axis=0).mul(100).round(1)
+    avg = (sums["score_sum"] / total).round(3)
+    return [
+        {
+            "period": str(period),
+            "positive": float(pos),
+            "negative": float(neg),
+            "neutral": float(neu),
+            "avg_sentiment": float(score),
+        }
+        for period, pos, neg, neu, score in zip(
+            sums.index, pct["positive"], pct["negative"], pct["neutral"], avg
         )
-    return timeline
+    ]
 
 
 def get_sentiment_breakdown(df: pd.DataFrame) -> dict[str, int]:
@@ -0,0 +1,261 @@
+"""Mergeable fixed-memory sketches for aggregate review statistics.
+
+Every sketch is updated one chunk at a time and two sketches of the same
+configuration merge into one that summarizes both inputs, so statistics over
+a stream of any length, or over datasets processed in parallel, fit in a
+constant amount of memory:
+
+- ``HeavyHitters``: count-min sketch plus a bounded candidate set, for the most
+  frequent words and bigrams. Counts never under-estimate and over-estimate by
+  at most ``e / width`` of the stream total with probability ``1 - e^-depth``.
+- ``HyperLogLog``: distinct counts (products, reviewers), ~0.8% standard error
+  at the default precision.
+- ``QuantileSketch``: fine histogram over a bounded range (sentiment and fake
+  scores), with exact count, mean, min and max and quantiles accurate to one
+  bin width.
+
+``ReviewAggregates`` combines them into the overview of an enriched dataset.
+"""
+import pickle
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from ..utils.data_processing import get_product_column, tokenize_texts, word_counts
+
+# Any 16-character keys work; they only need to differ from each other
+_HASH_KEYS = ("reviewsketch0001", "reviewsketch0002")
+
+
+def _hash(values, key: str = _HASH_KEYS[0]) -> np.ndarray:
+    """64-bit hashes of values, by their string form so chunks that parsed a column
+    differently (e.g. int vs str product ids) still agree."""
+    strings = pd.Series(values, dtype=object).astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(strings, hash_key=key, categorize=False)
+
+
+class HeavyHitters:
+    """Approximate top-``capacity`` items by count."""
+
+    def __init__(self, capacity: int = 200, width: int = 2 ** 13, depth: int = 4):
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        self.candidates = np.empty(0, dtype=object)
+
+    def _columns(self, items: np.ndarray) -> np.ndarray:
+        # Double hashing: row i uses h1 + i * h2
+        h1 = _hash(items, _HASH_KEYS[0])
+        h2 = _hash(items, _HASH_KEYS[1]) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1[None, :] + rows * h2[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def estimate(self, items) -> np.ndarray:
+        items = np.asarray(items, dtype=object)
+        if not len(items):
+            return np.empty(0, dtype=np.int64)
+        columns = self._columns(items)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def _refresh(self, items: np.ndarray):
+        pool = pd.unique(np.concatenate([self.candidates, items]))
+        if len(pool) > self.capacity:
+            estimates = self.estimate(pool)
+            pool = pool[np.argpartition(-estimates, self.capacity - 1)[:self.capacity]]
+        self.candidates = np.asarray(pool, dtype=object)
+
+    def update(self, counts: Counter | dict):
+        if not counts:
+            return
+        items = np.array(list(counts), dtype=object)
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        for row, columns in enumerate(self._columns(items)):
+            self.table[row] += np.bincount(columns, weights=weights, minlength=self.width).astype(np.int64)
+        self.total += int(weights.sum())
+        self._refresh(items)
+
+    def merge(self, other: "HeavyHitters"):
+        self.table += other.table
+        self.total += other.total
+        self._refresh(other.candidates)
+
+    def most_common(self, n: int | None = None) -> list[tuple[str, int]]:
+        estimates = self.estimate(self.candidates)
+        order = np.lexsort((self.candidates.astype(str), -estimates))[:n]
+        return [(str(self.candidates[i]), int(estimates[i])) for i in order]
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return
+        hashes = _hash(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Rank = position of the first 1 bit in the remaining bits; the sentinel keeps it finite
+        rest = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        rank = (64 - np.floor(np.log2(rest.astype(np.float64)))).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    def __init__(self, low: float, high: float, bins: int = 2000):
+        self.low = low
+        self.high = high
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.n = 0
+        self.sum = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        bins = len(self.counts)
+        index = np.clip(((values - self.low) / (self.high - self.low) * bins).astype(np.int64), 0, bins - 1)
+        self.counts += np.bincount(index, minlength=bins)
+        self.n += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: "QuantileSketch"):
+        self.counts += other.counts
+        self.n += other.n
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def mean(self) -> float:
+        return self.sum / self.n if self.n else 0.0
+
+    def quantile(self, q: float) -> float:
+        if not self.n:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), q * self.n, side="left"))
+        width = (self.high - self.low) / len(self.counts)
+        value = self.low + (min(index, len(self.counts) - 1) + 0.5) * width
+        return float(min(max(value, self.min), self.max))
+
+
+def bigram_counts(texts) -> Counter:
+    """Counts of adjacent token pairs, joined by a space."""
+    return Counter(chain.from_iterable(
+        (f"{a} {b}" for a, b in zip(tokens, tokens[1:])) for tokens in tokenize_texts(texts)
+    ))
+
+
+class ReviewAggregates:
+    """Overview statistics of enriched reviews, built chunk by chunk in fixed memory."""
+
+    FAKE_THRESHOLD = 0.3
+    QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+    def __init__(self):
+        self.rows = 0
+        self.ratings = np.zeros(6, dtype=np.int64)
+        self.sentiments = {"positive": 0, "negative": 0, "neutral": 0}
+        self.fake = 0
+        self.sentiment_scores = QuantileSketch(-1.0, 1.0)
+        self.fake_scores = QuantileSketch(0.0, 1.0)
+        self.words = {label: HeavyHitters() for label in ("all", "positive", "negative")}
+        self.bigrams = HeavyHitters()
+        self.products = HyperLogLog()
+        self.reviewers = HyperLogLog()
+
+    def update(self, df: pd.DataFrame):
+        """Add one chunk of enriched reviews (with sentiment and fake_score columns)."""
+        self.rows += len(df)
+        self.ratings += np.bincount(df["rating"].to_numpy(dtype=np.int64), minlength=6)[:6]
+        for label, count in df["sentiment"].value_counts().items():
+            self.sentiments[label] = self.sentiments.get(label, 0) + int(count)
+        self.fake += int((df["fake_score"] >= self.FAKE_THRESHOLD).sum())
+        self.sentiment_scores.update(df["sentiment_score"])
+        self.fake_scores.update(df["fake_score"])
+
+        self.words["all"].update(word_counts(df["review_text"]))
+        for label in ("positive", "negative"):
+            self.words[label].update(word_counts(df.loc[df["sentiment"] == label, "review_text"]))
+        self.bigrams.update(bigram_counts(df["review_text"]))
+
+        product_col = get_product_column(df)
+        if product_col is not None:
+            self.products.update(df[product_col])
+        if "reviewer_id" in df.columns:
+            self.reviewers.update(df["reviewer_id"])
+
+    def merge(self, other: "ReviewAggregates"):
+        self.rows += other.rows
+        self.ratings += other.ratings
+        for label, count in other.sentiments.items():
+            self.sentiments[label] = self.sentiments.get(label, 0) + count
+        self.fake += other.fake
+        self.sentiment_scores.merge(other.sentiment_scores)
+        self.fake_scores.merge(other.fake_scores)
+        for label, sketch in self.words.items():
+            sketch.merge(other.words[label])
+        self.bigrams.merge(other.bigrams)
+        self.products.merge(other.products)
+        self.reviewers.merge(other.reviewers)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, chunk_rows: int = 100_000) -> "ReviewAggregates":
+        aggregates = cls()
+        for start in range(0, len(df), chunk_rows):
+            aggregates.update(df.iloc[start:start + chunk_rows])
+        return aggregates
+
+    def to_bytes(self) -> bytes:
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def from_bytes(payload: bytes) -> "ReviewAggregates":
+        return pickle.loads(payload)
+
+    def summary(self, top_n: int = 40) -> dict:
+        total = self.rows
+        rated = self.ratings[1:].sum()
+        return {
+            "overview": {
+                "total_reviews": total,
+                "avg_rating": round(float((self.ratings * np.arange(6)).sum() / rated), 2) if rated else 0.0,
+                "sentiment_score": round(self.sentiment_scores.mean(), 3),
+                "fake_review_percentage": round(self.fake / total * 100, 1) if total else 0.0,
+                "distinct_products": self.products.count(),
+                "distinct_reviewers": self.reviewers.count(),
+            },
+            "rating_distribution": {str(r): int(self.ratings[r]) for r in range(1, 6) if self.ratings[r]},
+            "sentiment_breakdown": dict(self.sentiments),
+            "sentiment_score_quantiles": {
+                str(q): round(self.sentiment_scores.quantile(q), 3) for q in self.QUANTILES
+            },
+            "fake_score_quantiles": {str(q): round(self.fake_scores.quantile(q), 3) for q in self.QUANTILES},
+            "word_frequencies": {
+                label: [{"word": w, "count": c} for w, c in sketch.most_common(top_n)]
+                for label, sketch in self.words.items()
+            },
+            "top_bigrams": [{"bigram": b, "count": c} for b, c in self.bigrams.most_common(top_n)],
+        }
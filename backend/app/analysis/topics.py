@@ -1,10 +1,25 @@
+import time
+
 import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.special import digamma
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.decomposition import LatentDirichletAllocation
-from collections import Counter
 
-from ..utils.data_processing import tokenize
+from ..utils.data_processing import word_counts
+from ..utils.parallel import map_texts
 
+# Reviews the time-budgeted mode fits LDA on; the rest only go through transform
+TOPIC_SAMPLE_SIZE = 5000
+# Reviews whose perplexity is measured after every epoch
+PERPLEXITY_SAMPLE_SIZE = 500
+# Stop fitting once an epoch improves perplexity by less than this fraction
+PERPLEXITY_TOL = 0.01
+MAX_EPOCHS = 20
+# Reviews vectorized and transformed per batch when assigning topics
+TRANSFORM_BATCH = 5000
+_EPS = np.finfo(float).eps
 
 TOPIC_LABELS = {
     "quality": ["quality", "build", "material", "durable", "cheap", "solid", "broke", "flimsy"],
@@ -31,55 +46,226 @@ def _label_topic(keywords: list[str]) -> str:
     return best_label
 
 
-def extract_topics(texts: list[str], n_topics: int = 6, n_words: int = 8) -> list[dict]:
-    if len(texts) < 10:
-        return []
+def _topic_entries(components: np.ndarray, feature_names, counts: np.ndarray, n_words: int) -> list[dict]:
+    total = counts.sum()
+    topics = []
+    for component, count in zip(components, counts):
+        top_indices = component.argsort()[-n_words:][::-1]
+        keywords = [feature_names[i] for i in top_indices]
+        label = _label_topic(keywords)
+        topics.append({
+            "name": label.title(),
+            "keywords": keywords,
+            "count": int(count),
+            "weight": round(float(count / total), 3) if total else 0.0,
+        })
+    return topics
+
+
+class TopicModel:
+    """A CountVectorizer + LDA pair fitted on a sample of reviews."""
+
+    def __init__(self, vectorizer: CountVectorizer, lda: LatentDirichletAllocation):
+        self.vectorizer = vectorizer
+        self.lda = lda
+        self.feature_names = vectorizer.get_feature_names_out()
+
+    def transform(self, texts: list[str], batch_size: int = TRANSFORM_BATCH) -> tuple[np.ndarray, np.ndarray]:
+        """Return the topic distribution of every text and its number of in-vocabulary words.
+
+        Large inputs are split across the process pool (see utils.parallel).
+        """
+        return map_texts("topic_transform", texts, self, batch_size)
+
+    def _transform(self, texts: list[str], batch_size: int) -> tuple[np.ndarray, np.ndarray]:
+        doc_topic = np.empty((len(texts), self.lda.n_components))
+        lengths = np.empty(len(texts))
+        for start in range(0, len(texts), batch_size):
+            doc_term = self.vectorizer.transform(texts[start:start + batch_size])
+            doc_topic[start:start + batch_size] = self.doc_topic(doc_term)
+            lengths[start:start + batch_size] = np.asarray(doc_term.sum(axis=1)).ravel()
+        return doc_topic, lengths
+
+    def doc_topic(self, doc_term) -> np.ndarray:
+        """Normalized topic distribution of each row of a document-term matrix.
+
+        The same variational E-step as ``LatentDirichletAllocation.transform``,
+        but run on the whole batch at once with sparse matrix products instead
+        of document by document. Documents drop out as they converge, as they do
+        in scikit-learn, so the results match to floating point precision.
+        """
+        lda = self.lda
+        doc_term = sp.csr_matrix(doc_term, dtype=np.float64)
+        exp_topic_word = lda.exp_dirichlet_component_
+        gamma = np.ones((doc_term.shape[0], lda.n_components))
+        active = np.arange(doc_term.shape[0])
+        for _ in range(lda.max_doc_update_iter):
+            current = gamma[active]
+            exp_doc_topic = np.exp(digamma(current) - digamma(current.sum(axis=1, keepdims=True)))
+            counts = doc_term[active].tocoo()
+            norm_phi = np.einsum(
+                "ik,ki->i", exp_doc_topic[counts.row], exp_topic_word[:, counts.col]
+            ) + _EPS
+            ratio = sp.csr_matrix((counts.data / norm_phi, (counts.row, counts.col)), shape=counts.shape)
+            updated = exp_doc_topic * (ratio @ exp_topic_word.T) + lda.doc_topic_prior_
+            change = np.abs(updated - current).mean(axis=1)
+            gamma[active] = updated
+            active = active[change >= lda.mean_change_tol]
+            if not len(active):
+                break
+        return gamma / gamma.sum(axis=1, keepdims=True)
+
+    def describe(self, doc_topic: np.ndarray, lengths: np.ndarray, n_words: int = 8) -> list[dict]:
+        """Topics in the usual shape, with counts taken from the transformed corpus."""
+        counts = (doc_topic * lengths[:, None]).sum(axis=0)
+        return _topic_entries(self.lda.components_, self.feature_names, counts, n_words)
+
+
+def _transform_texts(texts: list[str], model: TopicModel, batch_size: int) -> tuple[np.ndarray, np.ndarray]:
+    return model._transform(texts, batch_size)
+
+
+def fit_topic_model(texts: list[str], n_topics: int = 6, time_budget: float = 10.0) -> TopicModel | None:
+    """Fit LDA on a random sample of at most TOPIC_SAMPLE_SIZE texts within ``time_budget`` seconds.
+
+    Runs online LDA one epoch at a time and stops when perplexity on a fixed
+    subset of the sample improves by less than PERPLEXITY_TOL, after MAX_EPOCHS,
+    or when another epoch plus the later transform of the full corpus would
+    overrun the budget. At least one epoch always runs.
+    """
+    deadline = time.perf_counter() + time_budget
+    rng = np.random.default_rng(42)
+    if len(texts) > TOPIC_SAMPLE_SIZE:
+        sample = [texts[i] for i in np.sort(rng.choice(len(texts), TOPIC_SAMPLE_SIZE, replace=False))]
+    else:
+        sample = list(texts)
 
     vectorizer = CountVectorizer(
-        max_df=0.9, min_df=max(2, len(texts) // 100),
+        max_df=0.9, min_df=max(2, len(sample) // 100),
         max_features=2000, stop_words="english"
     )
     try:
-        doc_term = vectorizer.fit_transform(texts)
+        doc_term = vectorizer.fit_transform(sample)
     except ValueError:
-        return []
+        return None
 
     lda = LatentDirichletAllocation(
-        n_components=min(n_topics, len(texts) // 5),
-        random_state=42, max_iter=20, learning_method="online"
+        n_components=min(n_topics, len(sample) // 5),
+        random_state=42, learning_method="online", total_samples=doc_term.shape[0],
     )
-    lda.fit(doc_term)
+    model = TopicModel(vectorizer, lda)
+    scored = doc_term[rng.permutation(doc_term.shape[0])[:PERPLEXITY_SAMPLE_SIZE]]
+    transform_cost = None
+    previous = None
+    for _ in range(MAX_EPOCHS):
+        started = time.perf_counter()
+        lda.partial_fit(doc_term)
+        perplexity = lda.perplexity(scored)
+        now = time.perf_counter()
 
-    feature_names = vectorizer.get_feature_names_out()
-    topics = []
-    for idx, component in enumerate(lda.components_):
-        top_indices = component.argsort()[-n_words:][::-1]
-        keywords = [feature_names[i] for i in top_indices]
-        label = _label_topic(keywords)
-        topics.append({
-            "name": label.title(),
-            "keywords": keywords,
-            "count": int(component.sum()),
-            "weight": round(float(component.sum() / lda.components_.sum()), 3),
-        })
-    return topics
+        if transform_cost is None:
+            # Price the full-corpus assignment from a transform of the scored subset
+            model.doc_topic(scored)
+            transform_cost = (time.perf_counter() - now) / scored.shape[0] * len(texts)
+            now = time.perf_counter()
+        if previous is not None and (previous - perplexity) / previous < PERPLEXITY_TOL:
+            break
+        if now + (now - started) + transform_cost > deadline:
+            break
+        previous = perplexity
+    return model
 
 
 def get_word_frequencies(texts: list[str], top_n: int = 40) -> list[dict]:
-    all_tokens = []
-    for t in texts:
-        all_tokens.extend(tokenize(t))
-    counter = Counter(all_tokens)
+    counter = word_counts(texts)
     return [{"word": w, "count": c} for w, c in counter.most_common(top_n)]
 
 
-def extract_topics_by_sentiment(df) -> dict:
-    positive = df[df["sentiment"] == "positive"]["review_text"].tolist()
-    negative = df[df["sentiment"] == "negative"]["review_text"].tolist()
-    return {
-        "positive": extract_topics(positive, n_topics=4),
-        "negative": extract_topics(negative, n_topics=4),
-    }
+def assign_topics_by_sentiment(df: pd.DataFrame, time_budget: float) -> tuple[dict, pd.DataFrame]:
+    """Budgeted topics of positive and negative reviews plus every review's dominant topic.
+
+    Returns ``{"positive": [...], "negative": [...]}``, each a list of topics with
+    ``name``, ``keywords``, ``count`` and ``weight``, and a frame with one row per
+    review: ``topic`` (name, "" when unassigned), ``topic_id`` (index into that
+    sentiment's topic list, -1 when unassigned) and ``topic_probability``. Neutral
+    reviews and reviews without any in-vocabulary word stay unassigned.
+    """
+    sentiment = df["sentiment"].to_numpy()
+    texts = df["review_text"].to_numpy()
+    names = np.full(len(df), "", dtype=object)
+    topic_ids = np.full(len(df), -1, dtype=np.int32)
+    probabilities = np.zeros(len(df))
+
+    groups = {label: np.flatnonzero(sentiment == label) for label in ("positive", "negative")}
+    total = max(sum(len(rows) for rows in groups.values()), 1)
+    topics = {}
+    for label, rows in groups.items():
+        topics[label] = []
+        if len(rows) < 10:
+            continue
+        model = fit_topic_model(texts[rows].tolist(), n_topics=4, time_budget=time_budget * len(rows) / total)
+        if model is None:
+            continue
+        doc_topic, lengths = model.transform(texts[rows].tolist())
+        topics[label] = model.describe(doc_topic, lengths)
+
+        assigned = lengths > 0
+        best = doc_topic.argmax(axis=1)
+        label_names = np.array([t["name"] for t in topics[label]], dtype=object)
+        names[rows[assigned]] = label_names[best[assigned]]
+        topic_ids[rows[assigned]] = best[assigned]
+        probabilities[rows[assigned]] = doc_topic[assigned, best[assigned]]
+
+    assignments = pd.DataFrame({"topic": names, "topic_id": topic_ids, "topic_probability": probabilities})
+    return topics, assignments
+
+
+def build_topic_index(topics: dict, sentiment, assignments: pd.DataFrame) -> tuple[list[dict], np.ndarray]:
+    """Group review row ids by (sentiment, topic).
+
+    Returns one entry per topic with its ``start``/``end`` offsets into the
+    returned row array. Rows of a topic are stored by descending probability,
+    so a page of its reviews is a plain slice.
+    """
+    sentiment = np.asarray(sentiment)
+    topic_ids = assignments["topic_id"].to_numpy()
+    probabilities = assignments["topic_probability"].to_numpy()
+    index, chunks, start = [], [], 0
+    for label, label_topics in topics.items():
+        in_label = sentiment == label
+        for topic_id, topic in enumerate(label_topics):
+            rows = np.flatnonzero(in_label & (topic_ids == topic_id))
+            rows = rows[np.argsort(-probabilities[rows], kind="stable")]
+            index.append({
+                "name": topic["name"],
+                "sentiment": label,
+                "topic_id": topic_id,
+                "keywords": topic["keywords"],
+                "review_count": len(rows),
+                "start": start,
+                "end": start + len(rows),
+            })
+            chunks.append(rows)
+            start += len(rows)
+    rows = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+    return index, rows
+
+
+def topic_rows(index: list[dict], rows: np.ndarray, probabilities: np.ndarray,
+               name: str, sentiment: str | None = None) -> np.ndarray | None:
+    """Row ids of reviews whose dominant topic is ``name`` (case-insensitive),
+    optionally of one sentiment, most probable first. None if no topic matches."""
+    entries = [
+        e for e in index
+        if e["name"].lower() == name.lower() and (sentiment is None or e["sentiment"] == sentiment)
+    ]
+    if not entries:
+        return None
+    if len(entries) == 1:
+        return rows[entries[0]["start"]:entries[0]["end"]]
+    # Several topics share the label: merge them, touching only their own rows
+    merged = np.concatenate([rows[e["start"]:e["end"]] for e in entries])
+    return merged[np.argsort(-probabilities[merged], kind="stable")]
 
 
 def get_word_frequencies_by_sentiment(df) -> dict:
@@ -2,25 +2,43 @@
 # It includes endpoints for uploading review datasets, performing comprehensive analysis, 
 # and making predictions based on review text. The application uses in-memory storage for uploaded datasets and provides 
 # a structured response with insights derived from the reviews. It also includes endpoints for listing and loading sample datasets. 
+# Datasets and analysis results live in a shared on-disk store, so the app can run with several uvicorn workers.
+# Heavy dependencies (pandas, scikit-learn, VADER) are imported on first use so a fresh worker answers /api/health quickly;
+# set WARMUP=1 to load them in the background as soon as the worker starts.
 # The code is organized to allow easy extension and integration of additional analysis features in the future.
 
 import os
 import json
-import uuid
-import numpy as np
-import pandas as pd
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from .models import (
     UploadResponse, PredictRequest, PredictResponse,
-    SampleDatasetInfo,
+    SampleDatasetInfo, ChunkedUploadRequest, ChunkedUploadStatus, SimilarReview,
+    FakeScoreRequest, FakeScoreBatchRequest, FakeScoreResponse,
 )
+from .utils.storage import dataset_store
+from .utils.singleflight import analysis_flights
+from .utils.http_cache import choose_encoding, compressed_variants, etag_matches, make_etag
+from .utils.loop_lag import loop_lag
+from .utils.admission import AdmissionControl, batch_slot, batch_work, priority_classes
+from .utils.uploads import upload_sessions, UploadConflict, MAX_CHUNK_BYTES
+from .utils.samples import SAMPLE_ID_PREFIX, SampleCatalog
+from .startup import warm_up
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
+        import numpy as np
         if isinstance(obj, (np.integer,)):
             return int(obj)
         if isinstance(obj, (np.floating,)):
@@ -28,15 +46,24 @@ class NumpyEncoder(json.JSONEncoder):
         if isinstance(obj, np.ndarray):
             return obj.tolist()
         return super().default(obj)
-from .utils.data_processing import preprocess_dataframe
-from .analysis.sentiment import analyze_sentiments, build_sentiment_timeline, get_sentiment_breakdown
-from .analysis.topics import extract_topics_by_sentiment, get_word_frequencies_by_sentiment
-from .analysis.fake_detection import detect_fake_reviews, get_suspicious_reviews
-from .analysis.predictions import predictor
-from .analysis.product_overview import detect_products, generate_overview_summary
 
-app = FastAPI(title="Product Review Intelligence API", version="1.0.0")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Optional warm-up so the first analysis does not pay for imports and lexicon loading
+    if os.environ.get("WARMUP", "0") == "1":
+        threading.Thread(target=_warm_up, daemon=True).start()
+    sweeper = asyncio.create_task(_sweep_periodically())
+    lag_probe = asyncio.create_task(loop_lag.run())
+    yield
+    sweeper.cancel()
+    lag_probe.cancel()
+
+
+app = FastAPI(title="Product Review Intelligence API", version="1.0.0", lifespan=lifespan)
+
+# Added before CORS so rejections still carry CORS headers
+app.add_middleware(AdmissionControl, classes=priority_classes)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -45,34 +72,282 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for uploaded dataframes
-_uploads: dict[str, pd.DataFrame] = {}
+# Seconds topic extraction may spend per analysis; models are fitted on a sample and stop early
+TOPIC_TIME_BUDGET = float(os.environ.get("TOPIC_TIME_BUDGET", "10"))
+
+# Version of the analysis code; bump it when a change alters what analyses compute, so results
+# (and the derived frames behind them) cached by an earlier version are rebuilt, and ETags change
+ANALYSIS_VERSION = "1"
+
+# How often each worker drops idle datasets from memory
+SWEEP_INTERVAL_SECONDS = 60
+
+# Most datasets one comparison may include
+MAX_COMPARED_DATASETS = 10
+
+# How long finalizing a chunked upload waits for parsing before answering 202
+FINALIZE_WAIT_SECONDS = 60
 
 SAMPLE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sample_data")
+sample_catalog = SampleCatalog(SAMPLE_DATA_DIR, dataset_store)
+
+# How often predictions check the store for a predictor fitted by another worker
+PREDICTOR_CHECK_SECONDS = 1.0
+_predictor_checked_at = 0.0
+
+# Serializes search and similarity index builds within this worker
+_search_index_lock = threading.Lock()
+
+
+async def _sweep_periodically():
+    """Release frames idle past DATASET_IDLE_TTL and clean up expired chunked uploads,
+    even when no request touches them."""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+        await asyncio.to_thread(dataset_store.sweep)
+        await asyncio.to_thread(upload_sessions.sweep)
+
+
+def _warm_up():
+    from .utils.parallel import warm_up_pool
+    warm_up()
+    _sync_predictor()
+    warm_up_pool()
+
+
+def _sync_predictor(force: bool = False):
+    """Load the predictor most recently fitted by any worker, if it is newer than ours.
+
+    The store is asked at most every PREDICTOR_CHECK_SECONDS, so predictions do not
+    each pay for a SQLite lookup; ``force`` checks now (e.g. before deciding to train).
+    """
+    global _predictor_checked_at
+    from .analysis.predictions import predictor
+
+    now = time.monotonic()
+    if not force and now - _predictor_checked_at < PREDICTOR_CHECK_SECONDS:
+        return
+    _predictor_checked_at = now
+    if dataset_store.object_version("predictor") <= predictor.version:
+        return
+    loaded = dataset_store.load_object("predictor")
+    if loaded is not None:
+        version, state = loaded
+        predictor.load_state(state, version)
+
+
+def _get_enriched(file_id: str) -> "pd.DataFrame":
+    """Return the dataset with per-row sentiment and fake-review features, computing
+    and storing them on first use so every later consumer shares the same columns."""
+    from .analysis.sentiment import analyze_sentiments
+    from .analysis.fake_detection import detect_fake_reviews
+    df = dataset_store.load_frame(file_id, kind="enriched")
+    if df is not None:
+        return df
+    # Heavy work on a cache miss counts against the batch limits (the slot is taken before the lock)
+    with batch_work(), dataset_store.build_lock(file_id, "enriched"):
+        df = dataset_store.load_frame(file_id, kind="enriched")
+        if df is not None:
+            return df
+        df = dataset_store.load_frame(file_id)
+        if df is None:
+            raise HTTPException(404, "File not found. Please upload again.")
+        df = analyze_sentiments(df)
+        df = detect_fake_reviews(df)
+        dataset_store.save_frame(file_id, df, kind="enriched")
+        return df
+
+
+def _get_rollup(file_id: str, df: "pd.DataFrame") -> "pd.DataFrame":
+    """Return the cached daily sentiment rollup (per product when possible) of a dataset."""
+    from .analysis.sentiment import build_daily_rollup
+    from .utils.data_processing import get_product_column
+    rollup = dataset_store.load_frame(file_id, kind="rollup")
+    if rollup is None:
+        with batch_work():
+            rollup = build_daily_rollup(df, product_col=get_product_column(df))
+            dataset_store.save_frame(file_id, rollup, kind="rollup")
+    return rollup
+
+
+def _get_aggregates(file_id: str, df: "pd.DataFrame | None" = None):
+    """Return the dataset's mergeable summary sketches, built chunk by chunk on first use."""
+    from .analysis.sketches import ReviewAggregates
+
+    cached = dataset_store.load_result(file_id, "aggregates")
+    if cached is not None:
+        return ReviewAggregates.from_bytes(cached)
+    if df is None:
+        df = _get_enriched(file_id)
+    with batch_work():
+        aggregates = ReviewAggregates.from_frame(df)
+        dataset_store.save_result(file_id, "aggregates", aggregates.to_bytes())
+    return aggregates
+
+
+def _get_key_insights(file_id: str, df: "pd.DataFrame") -> dict:
+    """Return the dataset's cached praise and complaint phrases."""
+    from .analysis.insights import extract_key_insights
+
+    cached = dataset_store.load_result(file_id, "insights")
+    if cached is not None:
+        return json.loads(cached)
+    with batch_work():
+        insights = extract_key_insights(df[df["sentiment"] == "positive"], df[df["sentiment"] == "negative"])
+        dataset_store.save_result(file_id, "insights", _encode(insights))
+    return insights
+
+
+def _get_topic_index(file_id: str, df: "pd.DataFrame | None" = None) -> dict:
+    """Return the cached topics and topic -> review index of a dataset, assigning a
+    dominant topic to every review on first use.
+
+    The per-review assignment is stored as the "topics" frame (row-aligned) and
+    the row ids grouped by topic as the "topic_rows" frame; the returned index
+    holds each topic's offsets into the latter.
+    """
+    import pandas as pd
+    from .analysis.topics import assign_topics_by_sentiment, build_topic_index
+
+    cached = dataset_store.load_result(file_id, "topics")
+    if cached is not None:
+        return json.loads(cached)
+    if df is None:
+        df = _get_enriched(file_id)
+    with batch_work(), dataset_store.build_lock(file_id, "topics"):
+        cached = dataset_store.load_result(file_id, "topics")
+        if cached is not None:
+            return json.loads(cached)
+        topics, assignments = assign_topics_by_sentiment(df, TOPIC_TIME_BUDGET)
+        index, rows = build_topic_index(topics, df["sentiment"], assignments)
+        dataset_store.save_frame(file_id, assignments, kind="topics")
+        dataset_store.save_frame(file_id, pd.DataFrame({"row": rows}), kind="topic_rows")
+        payload = {"topics": topics, "index": index}
+        dataset_store.save_result(file_id, "topics", _encode(payload))
+        return payload
+
+
+def _find_topic_rows(file_id: str, topic: str, sentiment: str | None):
+    """Row ids of a topic's reviews, most probable first; 404 if the topic is unknown."""
+    from .analysis.topics import topic_rows
+
+    index = _get_topic_index(file_id)["index"]
+    rows = dataset_store.load_frame(file_id, kind="topic_rows")["row"].to_numpy()
+    probabilities = dataset_store.load_frame(file_id, kind="topics")["topic_probability"].to_numpy()
+    found = topic_rows(index, rows, probabilities, topic, sentiment)
+    if found is None:
+        raise HTTPException(404, "Topic not found in this dataset")
+    return found
+
+
+def _get_search_index(file_id: str):
+    """Return the dataset's BM25 index, building and persisting it if it does not exist yet."""
+    from .utils.search import SearchIndex, build_search_index
+
+    arrays = dataset_store.load_arrays(file_id, "search")
+    if arrays is None:
+        with batch_work(), _search_index_lock:
+            arrays = dataset_store.load_arrays(file_id, "search")
+            if arrays is None:
+                df = dataset_store.load_frame(file_id)
+                if df is None:
+                    raise HTTPException(404, "File not found. Please upload again.")
+                if not dataset_store.save_arrays(file_id, "search", build_search_index(df["review_text"])):
+                    raise HTTPException(404, "File not found. Please upload again.")
+                arrays = dataset_store.load_arrays(file_id, "search")
+    return SearchIndex(arrays)
+
+
+def _get_similarity_index(file_id: str, build: bool = True):
+    """Return the dataset's similarity index, building it if needed and ``build`` is set."""
+    from .utils.similarity import SimilarityIndex, build_similarity_index
+
+    arrays = dataset_store.load_arrays(file_id, "similar_terms")
+    if arrays is None and build:
+        with batch_work(), _search_index_lock:
+            arrays = dataset_store.load_arrays(file_id, "similar_terms")
+            if arrays is None:
+                df = dataset_store.load_frame(file_id)
+                if df is None:
+                    raise HTTPException(404, "File not found. Please upload again.")
+                if not dataset_store.save_arrays(file_id, "similar_terms", build_similarity_index(df["review_text"])):
+                    raise HTTPException(404, "File not found. Please upload again.")
+                arrays = dataset_store.load_arrays(file_id, "similar_terms")
+    return SimilarityIndex(arrays) if arrays is not None else None
+
+
+def _build_indexes(file_id: str):
+    try:
+        _get_search_index(file_id)
+        _get_similarity_index(file_id)
+    except HTTPException:
+        # The dataset was deleted before its indexes were built
+        pass
+
+
+def _index_in_background(file_id: str):
+    """Build the search and similarity indexes of a newly ingested dataset without delaying the response."""
+    threading.Thread(target=_build_indexes, args=(file_id,), daemon=True).start()
+
+
+def _similar_reviews(file_id: str, text: str, k: int, exclude: int | None = None,
+                     build: bool = True) -> list[dict]:
+    index = _get_similarity_index(file_id, build=build)
+    df = dataset_store.load_frame(file_id)
+    if index is None or df is None:
+        return []
+    texts = df["review_text"]
+    return [
+        {
+            "row": row,
+            "similarity": round(similarity, 3),
+            "text": texts.iat[row][:500],
+            "rating": int(df["rating"].iat[row]),
+        }
+        for row, similarity in index.query(text, texts, k=k, exclude=exclude)
+    ]
+
+
+def _encode(result) -> bytes:
+    # Use NumpyEncoder to handle numpy int64/float64 types
+    return json.dumps(result, cls=NumpyEncoder).encode("utf-8")
+
 
 # Health check endpoint
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
 
-# File upload endpoint with validation and preprocessing
+# Admission control state of this worker: running, waiting, admitted and rejected requests per priority class
+@app.get("/api/metrics/admission")
+def admission_stats():
+    return {"pid": os.getpid(), **{name: c.stats() for name, c in priority_classes.items()}}
+
+# Event-loop lag of this worker (how late a periodic probe woke up), optionally resetting the window
+@app.get("/api/metrics/event-loop")
+def event_loop_lag(reset: bool = False):
+    return {"pid": os.getpid(), **loop_lag.snapshot(reset=reset)}
+
+# File upload endpoint: CSV or JSON Lines, optionally gzip/bz2/xz/zstd compressed, parsed as a stream
 @app.post("/api/upload", response_model=UploadResponse)
 async def upload_file(file: UploadFile = File(...)):
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(400, "Only CSV files are supported")
+    from .utils.ingest import detect_format, read_reviews
 
     try:
-        df = pd.read_csv(file.file)
-    except Exception as e:
-        raise HTTPException(400, f"Failed to parse CSV: {e}")
+        detect_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
+    # Parsing and storing run in a thread so a large upload does not stall the event loop
     try:
-        df = preprocess_dataframe(df)
+        df = await asyncio.to_thread(read_reviews, file.file, file.filename)
     except ValueError as e:
         raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(400, f"Failed to parse file: {e}")
 
-    file_id = str(uuid.uuid4())
-    _uploads[file_id] = df
+    file_id = await asyncio.to_thread(dataset_store.create, df, file.filename)
+    _index_in_background(file_id)
 
     return UploadResponse(
         file_id=file_id,
@@ -82,22 +357,228 @@ async def upload_file(file: UploadFile = File(...)):
         message="File uploaded and validated successfully",
     )
 
-# Analysis endpoint that performs all analyses and returns a comprehensive report
-@app.post("/api/analyze")
-async def analyze(file_id: str):
-    if file_id not in _uploads:
-        raise HTTPException(404, "File not found. Please upload again.")
+# Stored datasets with their on-disk size and whether this worker holds them in memory
+@app.get("/api/datasets")
+def list_datasets():
+    return dataset_store.list_datasets()
 
-    df = _uploads[file_id]
 
-    # Sentiment analysis
-    df = analyze_sentiments(df)
+# Memory use of this worker's dataset cache against its budget, resident vs spilled
+@app.get("/api/datasets/stats")
+def dataset_memory_stats():
+    stats = dataset_store.memory_stats()
+    datasets = dataset_store.list_datasets()
+    stats["resident_datasets"] = sum(d["state"] == "resident" for d in datasets)
+    stats["spilled_datasets"] = len(datasets) - stats["resident_datasets"]
+    stats["disk_bytes"] = sum(d["disk_bytes"] for d in datasets)
+    return stats
 
-    # Fake detection
-    df = detect_fake_reviews(df)
 
-    # Train predictor on this dataset
-    predictor.fit(df["review_text"].tolist(), df["rating"].tolist())
+# Delete a dataset with its derived frames, indexes and cached analyses
+@app.delete("/api/datasets/{file_id}")
+def delete_dataset(file_id: str):
+    # A sample is one copy shared by everyone who loaded it
+    if file_id.startswith(SAMPLE_ID_PREFIX):
+        raise HTTPException(403, "Sample datasets are shared and cannot be deleted")
+    if not dataset_store.delete(file_id):
+        raise HTTPException(404, "File not found")
+    return {"deleted": file_id}
+
+
+# Resumable chunked upload: create a session, then PUT chunks at increasing offsets
+@app.post("/api/uploads", response_model=ChunkedUploadStatus)
+def create_chunked_upload(req: ChunkedUploadRequest):
+    from .utils.ingest import detect_format
+
+    try:
+        detect_format(req.filename)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    session = upload_sessions.create(req.filename, req.total_size)
+    return upload_sessions.describe(session["upload_id"])
+
+
+# Status of a chunked upload; clients resume from the returned "received" offset
+@app.get("/api/uploads/{upload_id}", response_model=ChunkedUploadStatus)
+def chunked_upload_status(upload_id: str):
+    status = upload_sessions.describe(upload_id)
+    if status is None:
+        raise HTTPException(404, "Upload session not found")
+    return status
+
+
+# Append one chunk; bytes are parsed in the background while later chunks arrive
+@app.put("/api/uploads/{upload_id}", response_model=ChunkedUploadStatus)
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    too_large = HTTPException(413, f"Chunks may be at most {MAX_CHUNK_BYTES} bytes")
+    # Refuse an oversized chunk from its declared length, and stop reading one without a
+    # (truthful) length as soon as it exceeds the limit, instead of buffering all of it
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > MAX_CHUNK_BYTES:
+        raise too_large
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > MAX_CHUNK_BYTES:
+            raise too_large
+    data = bytes(data)
+    try:
+        await asyncio.to_thread(upload_sessions.append, upload_id, offset, data)
+    except KeyError:
+        raise HTTPException(404, "Upload session not found")
+    except UploadConflict as e:
+        raise HTTPException(409, str(e), headers={"Upload-Offset": str(e.received)})
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return upload_sessions.describe(upload_id)
+
+
+# Finish a chunked upload and wait (up to FINALIZE_WAIT_SECONDS) for the parser to catch up
+@app.post("/api/uploads/{upload_id}/finalize")
+async def finalize_chunked_upload(upload_id: str):
+    try:
+        await asyncio.to_thread(upload_sessions.finalize, upload_id)
+    except KeyError:
+        raise HTTPException(404, "Upload session not found")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + FINALIZE_WAIT_SECONDS
+    while True:
+        status = await asyncio.to_thread(upload_sessions.describe, upload_id)
+        if status is None:
+            raise HTTPException(404, "Upload session not found")
+        if status["status"] == "done":
+            _index_in_background(status["file_id"])
+            return UploadResponse(
+                file_id=status["file_id"],
+                filename=status["filename"],
+                total_rows=status["total_rows"],
+                columns=status["columns"],
+                message="File uploaded and validated successfully",
+            )
+        if status["status"] == "error":
+            raise HTTPException(400, status["error"])
+        if status["status"] in ("cancelled", "expired"):
+            raise HTTPException(404, "Upload session not found")
+        if loop.time() >= deadline:
+            return Response(
+                content=ChunkedUploadStatus(**status).model_dump_json(),
+                status_code=202, media_type="application/json",
+            )
+        await asyncio.sleep(0.1)
+
+
+# Abandon a chunked upload and delete its received bytes
+@app.delete("/api/uploads/{upload_id}")
+def cancel_chunked_upload(upload_id: str):
+    if upload_sessions.get(upload_id) is None:
+        raise HTTPException(404, "Upload session not found")
+    upload_sessions.cancel(upload_id)
+    return {"upload_id": upload_id, "status": "cancelled"}
+
+
+# Analysis endpoint that performs all analyses and returns a comprehensive report
+@app.post("/api/analyze")
+async def analyze(file_id: str):
+    encoded = await _analyze_once(file_id)
+    return Response(content=encoded, media_type="application/json")
+
+
+# The stored analysis report as a cacheable GET: strong ETag, 304 on a matching If-None-Match,
+# and the gzip/brotli copy compressed when the report was stored; analyzes the dataset if needed
+@app.get("/api/analysis")
+async def cached_analysis(file_id: str, request: Request):
+    meta = await asyncio.to_thread(_current_analysis_meta, file_id)
+    if meta is None:
+        await _analyze_once(file_id)
+        meta = await asyncio.to_thread(_current_analysis_meta, file_id)
+        if meta is None:
+            raise HTTPException(404, "File not found. Please upload again.")
+    if etag_matches(request.headers.get("if-none-match"), meta["etag"]):
+        return Response(status_code=304, headers=_cache_headers(meta["etag"]))
+
+    encoding = choose_encoding(request.headers.get("accept-encoding"), meta["encodings"])
+    key = f"analysis.{encoding}" if encoding else "analysis"
+    # Read the report with its own metadata, in case it was replaced since the check above
+    stored = await asyncio.to_thread(dataset_store.load_results, file_id, ["analysis.meta", key])
+    if key not in stored or "analysis.meta" not in stored:
+        raise HTTPException(404, "File not found. Please upload again.")
+    headers = _cache_headers(json.loads(stored["analysis.meta"])["etag"])
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=stored[key], media_type="application/json", headers=headers)
+
+
+def _cache_headers(etag: str) -> dict:
+    # no-cache: caches may keep the report but must revalidate it, which costs a 304
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+
+def _current_analysis_meta(file_id: str) -> dict | None:
+    meta = dataset_store.load_result(file_id, "analysis.meta")
+    if meta is None:
+        return None
+    meta = json.loads(meta)
+    return meta if meta["version"] == ANALYSIS_VERSION else None
+
+
+async def _analyze_once(file_id: str) -> bytes:
+    # Concurrent analyses of the same dataset, in this worker or another one, share a single run.
+    # Every caller holds its own batch slot while it waits (POST /api/analyze already has one), so
+    # a caller turned away with 429 fails alone instead of failing the run for the others
+    started = time.time()
+    async with batch_slot():
+        return await analysis_flights.run(
+            file_id,
+            lambda: _run_analysis(file_id),
+            lambda: dataset_store.load_result(file_id, "analysis", since=started),
+        )
+
+
+def _discard_stale_results(file_id: str):
+    """Drop everything derived from a dataset by another version of the analysis code."""
+    stored = dataset_store.load_results(file_id, ["analysis", "analysis.meta"])
+    if "analysis" not in stored:
+        return
+    meta = json.loads(stored["analysis.meta"]) if "analysis.meta" in stored else {}
+    if meta.get("version") != ANALYSIS_VERSION:
+        dataset_store.invalidate(file_id)
+
+
+def _save_analysis(file_id: str, encoded: bytes) -> bool:
+    """Store the report with its precompressed copies and the metadata the GET form serves it by;
+    False if the dataset was deleted while it was analyzed."""
+    variants = compressed_variants(encoded)
+    etag = make_etag(dataset_store.fingerprint(file_id) or file_id, ANALYSIS_VERSION, encoded)
+    meta = {"version": ANALYSIS_VERSION, "etag": etag, "encodings": sorted(variants)}
+    return dataset_store.save_results(file_id, {
+        "analysis": encoded,
+        **{f"analysis.{encoding}": body for encoding, body in variants.items()},
+        "analysis.meta": _encode(meta),
+    })
+
+
+def _run_analysis(file_id: str) -> bytes:
+    from .analysis.sentiment import build_sentiment_timeline, get_sentiment_breakdown, timeline_from_rollup
+    from .analysis.topics import get_word_frequencies_by_sentiment
+    from .analysis.fake_detection import get_suspicious_reviews
+    from .analysis.predictions import predictor
+    from .analysis.product_overview import detect_products, generate_overview_summary
+
+    _discard_stale_results(file_id)
+
+    # Sentiment analysis and fake detection
+    df = _get_enriched(file_id)
+
+    # Train predictor on this dataset, unless the shared one already is; the new model is
+    # published to the store first and then swapped in whole
+    _sync_predictor(force=True)
+    if predictor.dataset_id != file_id:
+        state = predictor.train(df["review_text"].tolist(), df["rating"].tolist(), dataset_id=file_id)
+        if state is not None:
+            predictor.load_state(state, dataset_store.save_object("predictor", state))
 
     # Build response
     total = len(df)
@@ -113,15 +594,11 @@ async def analyze(file_id: str):
     rating_dist = df["rating"].value_counts().sort_index().to_dict()
     rating_distribution = {str(k): int(v) for k, v in rating_dist.items()}
 
-    topics = extract_topics_by_sentiment(df)
+    topics = _get_topic_index(file_id, df)["topics"]
     word_frequencies = get_word_frequencies_by_sentiment(df)
 
     # Key insights: top complaint and praise phrases
-    positive_df = df[df["sentiment"] == "positive"]
-    negative_df = df[df["sentiment"] == "negative"]
-
-    from .analysis.insights import extract_key_insights
-    key_insights = extract_key_insights(positive_df, negative_df)
+    key_insights = _get_key_insights(file_id, df)
 
     suspicious = get_suspicious_reviews(df)
 
@@ -135,7 +612,10 @@ async def analyze(file_id: str):
         })
 
     sentiment_breakdown = get_sentiment_breakdown(df)
-    timeline = build_sentiment_timeline(df)
+    if "date" in df.columns and df["date"].notna().any():
+        timeline = timeline_from_rollup(_get_rollup(file_id, df))
+    else:
+        timeline = build_sentiment_timeline(df)
 
     # Product detection and AI overview
     product_info = detect_products(df)
@@ -154,54 +634,298 @@ async def analyze(file_id: str):
         "product_info": product_info,
         "ai_overview": ai_overview,
     }
-    # Use NumpyEncoder to handle numpy int64/float64 types
-    content = json.loads(json.dumps(result, cls=NumpyEncoder))
-    return JSONResponse(content=content)
+    encoded = _encode(result)
+    if not _save_analysis(file_id, encoded):
+        raise HTTPException(404, "File not found. Please upload again.")
+    return encoded
+
+
+# Per-product analysis endpoint: overview, sentiment, timeline, fake percentage and insights for every product
+@app.get("/api/products")
+def product_facets(file_id: str):
+    from .analysis.product_facets import build_product_facets
+    from .utils.data_processing import get_product_column
+
+    cached = dataset_store.load_result(file_id, "products")
+    if cached is None:
+        df = _get_enriched(file_id)
+        if get_product_column(df) is None:
+            raise HTTPException(400, "Dataset has no product_id or product_name column")
+        with batch_work():
+            facets = build_product_facets(df, rollup=_get_rollup(file_id, df))
+            for facet in facets:
+                dataset_store.save_result(file_id, f"product:{facet['product_id']}", _encode(facet))
+            cached = _encode(facets)
+            dataset_store.save_result(file_id, "products", cached)
+    return Response(content=cached, media_type="application/json")
+
+
+# Single product facet, served from the per-product cache
+@app.get("/api/products/{product_id}")
+def product_facet(product_id: str, file_id: str):
+    cached = dataset_store.load_result(file_id, f"product:{product_id}")
+    if cached is None:
+        product_facets(file_id)
+        cached = dataset_store.load_result(file_id, f"product:{product_id}")
+    if cached is None:
+        raise HTTPException(404, "Product not found in this dataset")
+    return Response(content=cached, media_type="application/json")
+
+
+# Sentiment timeline at a chosen granularity, optionally for one product, derived from the daily rollup
+@app.get("/api/timeline")
+def sentiment_timeline(file_id: str, granularity: str = "month", product_id: str | None = None):
+    from .analysis.sentiment import timeline_from_rollup, TIMELINE_GRANULARITIES
+
+    if granularity not in TIMELINE_GRANULARITIES:
+        raise HTTPException(400, f"granularity must be one of: {', '.join(TIMELINE_GRANULARITIES)}")
+    rollup = dataset_store.load_frame(file_id, kind="rollup")
+    if rollup is None:
+        df = _get_enriched(file_id)
+        if "date" not in df.columns or df["date"].isna().all():
+            raise HTTPException(400, "Dataset has no review dates")
+        rollup = _get_rollup(file_id, df)
+    if product_id is not None and "product" not in rollup.columns:
+        raise HTTPException(400, "Dataset has no product_id or product_name column")
+    return timeline_from_rollup(rollup, granularity=granularity, product=product_id)
+
+
+# Stream the full enriched dataset (per-row sentiment and fake-review scores) as CSV, Parquet or Arrow IPC
+@app.get("/api/export")
+def export_dataset(file_id: str, format: str = "csv", columns: str | None = None):
+    from .utils.export import EXPORT_FORMATS, content_disposition, iter_export
+
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    reader = dataset_store.open_frame(file_id, kind="enriched")
+    if reader is None:
+        _get_enriched(file_id)
+        reader = dataset_store.open_frame(file_id, kind="enriched")
+    info = dataset_store.get_info(file_id)
+    if reader is None or info is None:
+        # Deleted while it was being enriched
+        raise HTTPException(404, "File not found. Please upload again.")
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    unknown = [c for c in selected or [] if c not in reader.schema.names]
+    if unknown:
+        raise HTTPException(400, f"Unknown columns: {', '.join(unknown)}")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    name = os.path.splitext(info["filename"])[0] or "reviews"
+    return StreamingResponse(
+        iter_export(reader, format, selected),
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(f"{name}.enriched.{extension}")},
+    )
+
+
+# Approximate summary statistics from fixed-size sketches: top words and bigrams, distinct
+# products and reviewers, and sentiment / fake-score quantiles
+@app.get("/api/stats")
+def dataset_stats(file_id: str, top_n: int = 40):
+    return _get_aggregates(file_id).summary(top_n=max(1, min(top_n, 200)))
+
+
+# Side-by-side comparison of two or more datasets against the first one, from cached per-dataset aggregates
+@app.get("/api/compare")
+def compare(file_ids: list[str] = Query(...), granularity: str = "month", top_n: int = 15):
+    from .analysis.comparison import compare_datasets
+    from .analysis.sentiment import timeline_from_rollup, TIMELINE_GRANULARITIES
+
+    if not 2 <= len(file_ids) <= MAX_COMPARED_DATASETS:
+        raise HTTPException(400, f"Compare between 2 and {MAX_COMPARED_DATASETS} datasets")
+    if granularity not in TIMELINE_GRANULARITIES:
+        raise HTTPException(400, f"granularity must be one of: {', '.join(TIMELINE_GRANULARITIES)}")
+
+    datasets = []
+    for file_id in file_ids:
+        info = dataset_store.get_info(file_id)
+        if info is None:
+            raise HTTPException(404, f"File {file_id} not found. Please upload again.")
+        aggregates = dataset_store.load_result(file_id, "aggregates")
+        rollup = dataset_store.load_frame(file_id, kind="rollup")
+        insights = dataset_store.load_result(file_id, "insights")
+        needs_rollup = rollup is None and "date" in info["columns"]
+        # The enriched frame is only read for whatever this dataset has not cached yet
+        df = _get_enriched(file_id) if aggregates is None or needs_rollup or insights is None else None
+        if needs_rollup and df["date"].notna().any():
+            rollup = _get_rollup(file_id, df)
+        datasets.append({
+            "file_id": file_id,
+            "filename": info["filename"],
+            "aggregates": _get_aggregates(file_id, df),
+            "timeline": timeline_from_rollup(rollup, granularity=granularity) if rollup is not None else [],
+            "insights": json.loads(insights) if insights is not None else _get_key_insights(file_id, df),
+        })
+    return compare_datasets(datasets, top_n=max(1, min(top_n, 100)))
+
+
+# Topics of a dataset with the number of reviews whose dominant topic each one is
+@app.get("/api/topics")
+def list_topics(file_id: str):
+    index = _get_topic_index(file_id)["index"]
+    return [{k: v for k, v in entry.items() if k not in ("start", "end")} for entry in index]
+
+
+# Reviews about one topic, most representative first, optionally for one sentiment
+@app.get("/api/topics/{topic}/reviews")
+def topic_reviews(file_id: str, topic: str, sentiment: str | None = None, limit: int = 20, offset: int = 0):
+    rows = _find_topic_rows(file_id, topic, sentiment)
+    page = rows[max(offset, 0):max(offset, 0) + min(max(limit, 0), 500)]
+    df = _get_enriched(file_id)
+    probabilities = dataset_store.load_frame(file_id, kind="topics")["topic_probability"].to_numpy()
+    reviews = []
+    for row in page:
+        review = df.iloc[row]
+        reviews.append({
+            "row": int(row),
+            "text": review["review_text"][:500],
+            "rating": int(review["rating"]),
+            "sentiment": review["sentiment"],
+            "sentiment_score": round(float(review["sentiment_score"]), 3),
+            "topic_probability": round(float(probabilities[row]), 3),
+        })
+    return {"topic": topic, "sentiment": sentiment, "total": len(rows), "reviews": reviews}
+
+
+# Sentiment timeline of the reviews about one topic, built from those reviews only
+@app.get("/api/topics/{topic}/timeline")
+def topic_timeline(file_id: str, topic: str, sentiment: str | None = None, granularity: str = "month"):
+    import numpy as np
+    from .analysis.sentiment import (
+        build_daily_rollup, build_sentiment_timeline, timeline_from_rollup, TIMELINE_GRANULARITIES,
+    )
+
+    if granularity not in TIMELINE_GRANULARITIES:
+        raise HTTPException(400, f"granularity must be one of: {', '.join(TIMELINE_GRANULARITIES)}")
+    rows = _find_topic_rows(file_id, topic, sentiment)
+    subset = _get_enriched(file_id).iloc[np.sort(rows)]
+    if "date" in subset.columns and subset["date"].notna().any():
+        return timeline_from_rollup(build_daily_rollup(subset), granularity=granularity)
+    return build_sentiment_timeline(subset)
+
+
+# Full-text search with BM25 ranking; quoted phrases must match, filters apply to the matches only
+@app.get("/api/search")
+def search_reviews(
+    file_id: str,
+    q: str,
+    rating: int | None = None,
+    sentiment: str | None = None,
+    product_id: str | None = None,
+    min_fake_score: float | None = None,
+    max_fake_score: float | None = None,
+    limit: int = 20,
+    offset: int = 0,
+):
+    from .utils.data_processing import get_product_column
+    from .utils.search import filter_rows
+
+    index = _get_search_index(file_id)
+    if sentiment is not None or min_fake_score is not None or max_fake_score is not None:
+        df = _get_enriched(file_id)
+    else:
+        df = dataset_store.load_frame(file_id, kind="enriched")
+        if df is None:
+            df = dataset_store.load_frame(file_id)
+    product_col = get_product_column(df)
+    if product_id is not None and product_col is None:
+        raise HTTPException(400, "Dataset has no product_id or product_name column")
+
+    keep = filter_rows(df, rating, sentiment, product_id, min_fake_score, max_fake_score)
+    total, rows, scores = index.search(q, limit=limit, offset=offset, keep=keep)
+    results = []
+    for row, score in zip(rows, scores):
+        review = df.iloc[row]
+        result = {
+            "row": int(row),
+            "score": round(float(score), 3),
+            "text": review["review_text"][:500],
+            "rating": int(review["rating"]),
+        }
+        if product_col is not None:
+            result["product"] = str(review[product_col])
+        if "sentiment" in df.columns:
+            result["sentiment"] = review["sentiment"]
+            result["fake_score"] = round(float(review["fake_score"]), 2)
+        results.append(result)
+    return {"query": q, "total": total, "results": results}
+
+
+# "More like this": reviews most similar to an existing review (row) or to free text
+@app.get("/api/similar")
+def similar_reviews(file_id: str, row: int | None = None, text: str | None = None, k: int = 10):
+    if (row is None) == (text is None):
+        raise HTTPException(400, "Pass either row or text")
+    k = min(max(k, 1), 100)
+    if row is not None:
+        df = dataset_store.load_frame(file_id)
+        if df is None:
+            raise HTTPException(404, "File not found. Please upload again.")
+        if not 0 <= row < len(df):
+            raise HTTPException(404, "Review not found in this dataset")
+        text = df["review_text"].iat[row]
+    return {"results": _similar_reviews(file_id, text, k=k, exclude=row)}
 
 
 # Prediction endpoint that uses the trained predictor to predict rating from review text
+# (a plain def: the model, VADER and the similarity lookup run in the threadpool, off the event loop)
 @app.post("/api/predict", response_model=PredictResponse)
-async def predict_rating(req: PredictRequest):
+def predict_rating(req: PredictRequest):
+    from .analysis.predictions import predictor
+    _sync_predictor()
     result = predictor.predict(req.text)
+    file_id = req.file_id or predictor.dataset_id
+    if file_id is not None:
+        # Only use an index that already exists; building one here would stall the prediction
+        result["similar_reviews"] = [
+            SimilarReview(**r) for r in _similar_reviews(file_id, req.text, k=5, build=False)
+        ]
     return PredictResponse(**result)
 
 
-# Endpoint to list available sample datasets
+# Real-time fake-review score of one submitted review, with the same rules as the dataset analysis
+@app.post("/api/fake-score", response_model=FakeScoreResponse)
+def fake_score(req: FakeScoreRequest):
+    from .analysis.fake_detection import score_reviews
+    return score_reviews([req.model_dump()])[0]
+
+
+# Real-time fake-review scores of up to 1000 submitted reviews, in request order
+@app.post("/api/fake-score/batch", response_model=list[FakeScoreResponse])
+def fake_score_batch(req: FakeScoreBatchRequest):
+    from .analysis.fake_detection import score_reviews
+    return score_reviews([review.model_dump() for review in req.reviews])
+
+
+# Endpoint to list available sample datasets from the cached manifest
 @app.get("/api/sample-data", response_model=list[SampleDatasetInfo])
 def list_sample_data():
-    datasets = []
-    if os.path.isdir(SAMPLE_DATA_DIR):
-        for fname in os.listdir(SAMPLE_DATA_DIR):
-            if fname.endswith(".csv"):
-                path = os.path.join(SAMPLE_DATA_DIR, fname)
-                try:
-                    row_count = sum(1 for _ in open(path, encoding="utf-8")) - 1
-                except Exception:
-                    row_count = 0
-                datasets.append(SampleDatasetInfo(
-                    id=fname,
-                    name=fname.replace("_", " ").replace(".csv", "").title(),
-                    description=f"Sample dataset with {row_count} reviews",
-                    review_count=row_count,
-                ))
-    return datasets
-
-
-# Endpoint to load a sample dataset by ID and return its file_id for analysis
+    return [
+        SampleDatasetInfo(
+            id=entry["id"],
+            name=entry["name"],
+            description=f"Sample dataset with {entry['review_count']} reviews",
+            review_count=entry["review_count"],
+            columns=entry["columns"],
+            content_hash=entry["content_hash"],
+        )
+        for entry in sample_catalog.manifest()
+    ]
+
+
+# Endpoint to load a sample dataset by ID and return the file_id of its shared preprocessed copy
 @app.post("/api/load-sample/{dataset_id}")
-async def load_sample(dataset_id: str):
-    path = os.path.join(SAMPLE_DATA_DIR, dataset_id)
-    if not os.path.isfile(path):
+def load_sample(dataset_id: str):
+    loaded = sample_catalog.load(dataset_id)
+    if loaded is None:
         raise HTTPException(404, "Sample dataset not found")
-
-    df = pd.read_csv(path)
-    df = preprocess_dataframe(df)
-    file_id = str(uuid.uuid4())
-    _uploads[file_id] = df
+    file_id, total_rows = loaded
+    _index_in_background(file_id)
 
     return {
         "file_id": file_id,
         "filename": dataset_id,
-        "total_rows": len(df),
+        "total_rows": total_rows,
         "message": "Sample data loaded successfully",
     }
@@ -1,4 +1,5 @@
 # This module defines the data models used in the Product Review Intelligence API.
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -11,8 +12,34 @@ class UploadResponse(BaseModel):
     message: str
 
 
+class ChunkedUploadRequest(BaseModel):
+    filename: str
+    total_size: Optional[int] = Field(None, ge=0)
+
+
+class ChunkedUploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    received: int
+    total_size: Optional[int]
+    status: str
+    file_id: Optional[str]
+    total_rows: Optional[int]
+    columns: list[str]
+    error: Optional[str]
+
+
 class PredictRequest(BaseModel):
     text: str = Field(..., min_length=3, max_length=5000)
+    # Dataset to draw similar reviews from; defaults to the one the model was trained on
+    file_id: Optional[str] = None
+
+
+class SimilarReview(BaseModel):
+    row: int
+    similarity: float
+    text: str
+    rating: int
 
 
 class PredictResponse(BaseModel):
@@ -20,6 +47,28 @@ class PredictResponse(BaseModel):
     confidence: float
     sentiment: str
     sentiment_score: float
+    similar_reviews: list[SimilarReview] = []
+
+
+class FakeScoreRequest(BaseModel):
+    text: str = Field(..., min_length=1, max_length=5000)
+    rating: int = Field(..., ge=1, le=5)
+    # Optional VADER compound score; computed from the text when missing
+    sentiment_score: Optional[float] = Field(None, ge=-1, le=1)
+    # With a product, the review also counts toward burst detection (dated now if no date)
+    product_id: Optional[str] = None
+    date: Optional[datetime] = None
+
+
+class FakeScoreBatchRequest(BaseModel):
+    reviews: list[FakeScoreRequest] = Field(..., min_length=1, max_length=1000)
+
+
+class FakeScoreResponse(BaseModel):
+    fake_score: float
+    suspicious: bool
+    reasons: list[str]
+    sentiment_score: float
 
 
 class OverviewStats(BaseModel):
@@ -82,3 +131,5 @@ class SampleDatasetInfo(BaseModel):
     name: str
     description: str
     review_count: int
+    columns: list[str] = []
+    content_hash: str = ""
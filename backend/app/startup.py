@@ -0,0 +1,68 @@
+"""Cold-start helpers.
+
+``warm_up`` loads the analysis stack that ``app.main`` otherwise imports on first
+use. Running ``python -m app.startup`` prints where startup time goes: the cost of
+importing the API itself (what a new worker pays before answering /api/health)
+followed by the incremental cost of every warm-up step.
+"""
+import importlib
+import json
+import sys
+import time
+
+# Heavy modules in roughly the order the first analysis request loads them
+WARMUP_MODULES = [
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "scipy.sparse",
+    "sklearn.feature_extraction.text",
+    "sklearn.decomposition",
+    "sklearn.linear_model",
+    "vaderSentiment.vaderSentiment",
+    f"{__package__}.utils.data_processing",
+    f"{__package__}.analysis.sentiment",
+    f"{__package__}.analysis.fake_detection",
+    f"{__package__}.analysis.topics",
+    f"{__package__}.analysis.insights",
+    f"{__package__}.analysis.predictions",
+    f"{__package__}.analysis.product_overview",
+    f"{__package__}.analysis.product_facets",
+]
+
+
+def warm_up() -> list[dict]:
+    """Import the analysis modules and build the VADER lexicon; returns step timings."""
+    timings = []
+    for name in WARMUP_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings.append({"step": f"import {name}", "seconds": round(time.perf_counter() - start, 4)})
+
+    start = time.perf_counter()
+    from .analysis.sentiment import get_sentiment
+    get_sentiment("warm up")
+    timings.append({"step": "build VADER lexicon", "seconds": round(time.perf_counter() - start, 4)})
+    return timings
+
+
+def main():
+    start = time.perf_counter()
+    importlib.import_module(f"{__package__}.main")
+    report = [{"step": f"import {__package__}.main (ready for /api/health)",
+               "seconds": round(time.perf_counter() - start, 4)}]
+    report += warm_up()
+
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+        return
+
+    total = sum(r["seconds"] for r in report)
+    width = max(len(r["step"]) for r in report)
+    for r in report:
+        print(f"{r['step']:<{width}}  {r['seconds'] * 1000:8.1f} ms  {r['seconds'] / total * 100:5.1f}%")
+    print(f"{'total':<{width}}  {total * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Admission control: priority classes with bounded concurrency and queue depth.
+
+Every request belongs to a class. Batch work (analyses, exports, ingestion) may
+run at most BATCH_CONCURRENCY requests at a time per worker, with up to
+BATCH_QUEUE_DEPTH more waiting in FIFO order for at most BATCH_QUEUE_TIMEOUT
+seconds. Anything beyond that is rejected at once with 429 and a Retry-After
+estimated from how long recent batch requests took, instead of piling more CPU
+work onto a saturated worker. Interactive requests (predictions, health checks,
+cached results) have their own limit, unbounded by default, so they never wait
+behind batch work.
+
+Some interactive requests (cached results, search, topics) have to compute on a
+cache miss: enrichment, topic fitting, index builds. That work runs inside
+``batch_work()`` (or ``batch_slot()`` on the event loop), which takes a batch
+slot for its duration (or rejects with 429 like a batch request), so a cache
+miss is limited like the batch work it is.
+
+Limits are per worker: with several uvicorn workers the totals scale with them.
+The admission slot is held until the response body has been sent, so streamed
+responses (e.g. exports) count for as long as they stream.
+"""
+import asyncio
+import math
+import os
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "2"))
+BATCH_QUEUE_DEPTH = int(os.environ.get("BATCH_QUEUE_DEPTH", "8"))
+BATCH_QUEUE_TIMEOUT = float(os.environ.get("BATCH_QUEUE_TIMEOUT", "30"))
+# 0 (the default) admits every interactive request
+INTERACTIVE_CONCURRENCY = int(os.environ.get("INTERACTIVE_CONCURRENCY", "0"))
+
+# (method, path pattern) of batch requests; every other request is interactive
+BATCH_ROUTES = [
+    ("POST", re.compile(r"/api/analyze")),
+    ("GET", re.compile(r"/api/export")),
+    ("POST", re.compile(r"/api/upload")),
+    ("PUT", re.compile(r"/api/uploads/[^/]+")),
+    ("POST", re.compile(r"/api/uploads/[^/]+/finalize")),
+    ("POST", re.compile(r"/api/load-sample/[^/]+")),
+]
+
+# Retry-After bounds, and the request duration assumed before any has been measured
+_MIN_RETRY_SECONDS, _MAX_RETRY_SECONDS = 1, 300
+_INITIAL_DURATION_SECONDS = 5.0
+# Weight of the latest request in the moving average of request durations
+_DURATION_SMOOTHING = 0.2
+
+# The class the current request was admitted through, and its event loop; copied into
+# the threads the request runs work in
+_admitted: ContextVar[tuple["PriorityClass", asyncio.AbstractEventLoop] | None] = ContextVar(
+    "admitted", default=None,
+)
+
+
+class PriorityClass:
+    """One priority class: at most ``concurrency`` running requests (0 for no limit) and
+    at most ``queue_depth`` waiting for a slot."""
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int = 0, queue_timeout: float = 0.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        self._running = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._mean_duration = _INITIAL_DURATION_SECONDS
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if there is room; False if the request is rejected."""
+        if self._slots is not None:
+            if not self._slots.locked():
+                # A free slot: take it without waiting (never times out, whatever queue_timeout is)
+                await self._slots.acquire()
+            elif self._waiting >= self.queue_depth or self.queue_timeout <= 0:
+                self._rejected += 1
+                return False
+            else:
+                self._waiting += 1
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self._rejected += 1
+                    return False
+                finally:
+                    self._waiting -= 1
+        self._running += 1
+        self._admitted += 1
+        return True
+
+    def release(self, duration: float):
+        self._running -= 1
+        self._mean_duration += _DURATION_SMOOTHING * (duration - self._mean_duration)
+        if self._slots is not None:
+            self._slots.release()
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained enough to admit one more request."""
+        backlog = (self._running + self._waiting) / max(1, self.concurrency)
+        return min(_MAX_RETRY_SECONDS, max(_MIN_RETRY_SECONDS, math.ceil(self._mean_duration * backlog)))
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency or None,
+            "queue_depth": self.queue_depth if self._slots is not None else None,
+            "running": self._running,
+            "waiting": self._waiting,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "mean_duration_seconds": round(self._mean_duration, 3),
+        }
+
+
+def classify(method: str, path: str) -> str:
+    for batch_method, pattern in BATCH_ROUTES:
+        if method == batch_method and pattern.fullmatch(path):
+            return "batch"
+    return "interactive"
+
+
+class AdmissionControl:
+    """ASGI middleware that admits every HTTP request through its priority class."""
+
+    def __init__(self, app, classes: dict[str, PriorityClass]):
+        self.app = app
+        self.classes = classes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = self.classes[classify(scope["method"], scope["path"])]
+        if not await priority.acquire():
+            response = JSONResponse(
+                {"detail": f"Too many {priority.name} requests in progress, retry later"},
+                status_code=429,
+                headers={"Retry-After": str(priority.retry_after())},
+            )
+            await response(scope, receive, send)
+            return
+        started = time.monotonic()
+        token = _admitted.set((priority, asyncio.get_running_loop()))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _admitted.reset(token)
+            priority.release(time.monotonic() - started)
+
+
+@contextmanager
+def batch_work():
+    """Hold a batch slot while heavy work runs on behalf of a non-batch request.
+
+    For use in worker threads (sync endpoints, ``asyncio.to_thread``), not on the
+    event loop. A no-op in batch requests, which already hold a slot, and outside
+    requests (e.g. background index builds). Raises a 429 HTTPException when the
+    batch class is full.
+    """
+    admitted = _admitted.get()
+    batch = priority_classes["batch"]
+    if admitted is None or admitted[0] is batch:
+        yield
+        return
+    loop = admitted[1]
+    if not asyncio.run_coroutine_threadsafe(batch.acquire(), loop).result():
+        raise _too_many(batch)
+    started = time.monotonic()
+    # Nested heavy work in this thread runs under the slot already held
+    token = _admitted.set((batch, loop))
+    try:
+        yield
+    finally:
+        _admitted.reset(token)
+        loop.call_soon_threadsafe(batch.release, time.monotonic() - started)
+
+
+@asynccontextmanager
+async def batch_slot():
+    """``batch_work()`` for coroutines on the event loop: hold a batch slot, unless the
+    request already has one, and raise a 429 HTTPException when the batch class is full."""
+    admitted = _admitted.get()
+    batch = priority_classes["batch"]
+    if admitted is None or admitted[0] is batch:
+        yield
+        return
+    if not await batch.acquire():
+        raise _too_many(batch)
+    started = time.monotonic()
+    # Work this coroutine starts (threads, tasks) runs under the slot it holds
+    token = _admitted.set((batch, admitted[1]))
+    try:
+        yield
+    finally:
+        _admitted.reset(token)
+        batch.release(time.monotonic() - started)
+
+
+def _too_many(priority: PriorityClass) -> HTTPException:
+    return HTTPException(
+        429, f"Too many {priority.name} requests in progress, retry later",
+        headers={"Retry-After": str(priority.retry_after())},
+    )
+
+
+# This worker's priority classes
+priority_classes = {
+    "interactive": PriorityClass("interactive", INTERACTIVE_CONCURRENCY),
+    "batch": PriorityClass("batch", BATCH_CONCURRENCY, BATCH_QUEUE_DEPTH, BATCH_QUEUE_TIMEOUT),
+}
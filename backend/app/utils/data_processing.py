@@ -1,17 +1,53 @@
 import re
+from collections import Counter
+from itertools import chain
+
 import pandas as pd
 import numpy as np
 
-# Basic text cleaning function to normalize review text
-def clean_text(text: str) -> str:
+from .parallel import map_texts
+
+_URL_RE = re.compile(r"http\S+|www\S+")
+_TAG_RE = re.compile(r"<.*?>")
+
+
+# Translation table for the character filter: ASCII letters and whitespace are kept,
+# everything else becomes a space. Entries are filled in the first time a character is seen.
+class _LetterTable(dict):
+    def __missing__(self, ch: int) -> str:
+        c = chr(ch)
+        value = c if ("a" <= c <= "z" or "A" <= c <= "Z" or c.isspace()) else " "
+        self[ch] = value
+        return value
+
+
+_LETTERS = _LetterTable()
+
+
+def _clean(text) -> str:
     if not isinstance(text, str):
         return ""
     text = text.lower()
-    text = re.sub(r"http\S+|www\S+", "", text)
-    text = re.sub(r"<.*?>", "", text)
-    text = re.sub(r"[^a-zA-Z\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    # Cheap substring checks skip the regex scans for the many reviews without links or markup
+    if "http" in text or "www" in text:
+        text = _URL_RE.sub("", text)
+    if "<" in text:
+        text = _TAG_RE.sub("", text)
+    return " ".join(text.translate(_LETTERS).split())
+
+
+# Basic text cleaning function to normalize review text
+def clean_text(text: str) -> str:
+    return _clean(text)
+
+
+# Batch version of clean_text for a whole column (list, Series or any iterable)
+def clean_texts(texts) -> list[str]:
+    return map_texts("clean", texts)
+
+
+def _clean_many(texts) -> list[str]:
+    return [_clean(t) for t in texts]
 
 # A basic set of English stop words. In a real application, consider using a more comprehensive list from a library like NLTK or spaCy.
 STOP_WORDS = {
@@ -38,30 +74,124 @@ STOP_WORDS = {
 
 # Tokenization function that cleans text and removes stop words
 def tokenize(text: str) -> list[str]:
-    words = clean_text(text).split()
-    return [w for w in words if w not in STOP_WORDS and len(w) > 2]
+    return [w for w in _clean(text).split() if len(w) > 2 and w not in STOP_WORDS]
 
-# Preprocessing function that validates and normalizes the DataFrame
-def preprocess_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
 
-    # Normalize column names
-    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+# Batch version of tokenize: one token list per text
+def tokenize_texts(texts) -> list[list[str]]:
+    return map_texts("tokenize", texts)
 
-    # Map common column name variants
+
+def _tokenize_many(texts) -> list[list[str]]:
+    stop = STOP_WORDS
+    return [[w for w in _clean(t).split() if len(w) > 2 and w not in stop] for t in texts]
+
+
+# Token counts over a batch, equal to counting every list from tokenize_texts. Stop
+# words are dropped from the counts once per distinct word instead of once per occurrence.
+def word_counts(texts) -> Counter:
+    counts = Counter(chain.from_iterable(_clean(t).split() for t in texts))
+    for w in [w for w in counts if len(w) <= 2 or w in STOP_WORDS]:
+        del counts[w]
+    return counts
+
+
+# Tokenize a batch and encode it as one flat int32 array of token ids plus the number of
+# tokens in each row. Pass the vocabulary from an earlier call to encode more rows with the
+# same ids; new tokens are appended to it. Returns (ids, lengths, vocabulary token -> id).
+def encode_texts_flat(texts, vocabulary: dict[str, int] | None = None) -> tuple[np.ndarray, np.ndarray, dict[str, int]]:
+    vocabulary = {} if vocabulary is None else vocabulary
+    tokens = tokenize_texts(texts)
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    codes, uniques = pd.factorize(np.array(list(chain.from_iterable(tokens)), dtype=object))
+    remap = np.fromiter(
+        (vocabulary.setdefault(w, len(vocabulary)) for w in uniques), dtype=np.int32, count=len(uniques)
+    )
+    return remap[codes], lengths, vocabulary
+
+
+# Same as encode_texts_flat, but with one int32 array of token ids per row
+def encode_texts(texts, vocabulary: dict[str, int] | None = None) -> tuple[list[np.ndarray], dict[str, int]]:
+    ids, lengths, vocabulary = encode_texts_flat(texts, vocabulary)
+    if not len(lengths):
+        return [], vocabulary
+    return np.split(ids, np.cumsum(lengths)[:-1]), vocabulary
+
+# Return the column that identifies products, preferring ids over names
+def get_product_column(df: pd.DataFrame) -> str | None:
+    for col in ("product_id", "product_name"):
+        if col in df.columns and df[col].notna().any():
+            return col
+    return None
+
+# Columns preprocess_dataframe and the analyses actually read
+USED_COLUMNS = {"review_text", "rating", "date", "product_id", "product_name", "reviewer_id"}
+
+# Map raw column names to their normalized names, resolving common variants
+def map_columns(columns) -> dict[str, str]:
     col_map = {}
-    for c in df.columns:
+    for raw in columns:
+        c = str(raw).strip().lower().replace(" ", "_")
         if "review" in c and ("text" in c or "body" in c or "content" in c):
-            col_map[c] = "review_text"
+            c = "review_text"
         elif c in ("reviewtext", "comment", "comments", "feedback", "text"):
-            col_map[c] = "review_text"
+            c = "review_text"
         elif c in ("star", "stars", "score", "star_rating", "overall"):
-            col_map[c] = "rating"
+            c = "rating"
         elif "date" in c or "time" in c:
-            col_map[c] = "date"
-        elif "product" in c and "id" in c:
-            col_map[c] = "product_id"
-    df.rename(columns=col_map, inplace=True)
+            c = "date"
+        elif ("product" in c and "id" in c) or c in ("asin", "parent_asin"):
+            c = "product_id"
+        elif c in ("reviewerid", "reviewer_id", "user_id", "userid", "author", "reviewer", "username"):
+            c = "reviewer_id"
+        col_map[raw] = c
+    return col_map
+
+# Raw columns to keep: the first one mapped to each used name
+# (e.g. reviewTime and unixReviewTime both map to date)
+def used_columns(columns) -> list:
+    keep, seen = [], set()
+    for raw, name in map_columns(columns).items():
+        if name in USED_COLUMNS and name not in seen:
+            keep.append(raw)
+            seen.add(name)
+    return keep
+
+# Drop the columns preprocessing and the analyses never read
+def select_columns(df: pd.DataFrame) -> pd.DataFrame:
+    keep = used_columns(df.columns)
+    return df[keep] if keep else df
+
+# Parse a CSV reading only the columns that map to USED_COLUMNS. The header is read
+# first so wide exports (20-40 columns) skip tokenizing and type-inferring the rest.
+def read_reviews_csv(source) -> pd.DataFrame:
+    header = list(pd.read_csv(source, nrows=0).columns)
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    col_map = map_columns(header)
+    usecols = used_columns(header)
+    if len(set(header)) != len(header) or not usecols:
+        # Duplicate or unrecognized headers: parse everything and let preprocessing decide
+        usecols = None
+    dtype = {c: str for c in (usecols or []) if col_map[c] != "rating"}
+
+    try:
+        return pd.read_csv(source, usecols=usecols, dtype=dtype, engine="pyarrow")
+    except Exception:
+        # The pyarrow engine is stricter about malformed rows than the C parser
+        if not hasattr(source, "seek"):
+            raise
+        source.seek(0)
+        return pd.read_csv(source, usecols=usecols, dtype=dtype)
+
+# Preprocessing function that validates and normalizes the DataFrame
+def preprocess_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+
+    # Normalize column names and map common variants
+    col_map = map_columns(df.columns)
+    df.columns = list(col_map.values())
 
     if "review_text" not in df.columns:
         raise ValueError(
@@ -82,7 +212,17 @@ def preprocess_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     df["rating"] = df["rating"].astype(int).clip(1, 5)
 
     if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        date = df["date"]
+        if not pd.api.types.is_numeric_dtype(date) and date.notna().any():
+            numeric = pd.to_numeric(date, errors="coerce")
+            if numeric.notna().sum() == date.notna().sum():
+                date = numeric
+        if pd.api.types.is_numeric_dtype(date):
+            # Epoch timestamps, as in public review dumps: seconds, or milliseconds in newer ones
+            unit = "ms" if date.abs().max() > 1e11 else "s"
+            df["date"] = pd.to_datetime(date, unit=unit, errors="coerce")
+        else:
+            df["date"] = pd.to_datetime(date, errors="coerce")
 
     df.reset_index(drop=True, inplace=True)
     return df
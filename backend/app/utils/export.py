@@ -0,0 +1,130 @@
+"""Streaming export of a stored dataset as CSV, Parquet or Arrow IPC.
+
+The source is the dataset's stored Arrow IPC file, read through a memory map
+one record batch at a time, so exporting never converts it to pandas or
+decompresses the whole file. Every EXPORT_BATCH_ROWS rows are encoded into a
+small in-memory sink that is emptied after every piece; peak memory is a few
+batches no matter how large the dataset is.
+"""
+import io
+import re
+import unicodedata
+from collections.abc import Iterator
+from urllib.parse import quote
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# Media type and file extension of every format
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+# Rows encoded per streamed piece (and per Parquet row group)
+EXPORT_BATCH_ROWS = 50_000
+
+
+def content_disposition(filename: str) -> str:
+    """Attachment header for any filename: an ASCII ``filename`` fallback plus the exact
+    name as RFC 5987 ``filename*``, since header values must be latin-1."""
+    fallback = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+    fallback = re.sub(r'[^A-Za-z0-9._ -]', "_", fallback).strip() or "reviews"
+    if fallback.startswith("."):
+        fallback = f"reviews{fallback}"
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+class _Chunks(io.RawIOBase):
+    """Write-only stream that buffers what the Arrow writers produce until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _is_list(data_type) -> bool:
+    import pyarrow as pa
+    return pa.types.is_list(data_type) or pa.types.is_large_list(data_type)
+
+
+def _flatten_lists(batch: "pa.RecordBatch") -> "pa.RecordBatch":
+    """CSV has no list type: join list columns (e.g. fake_reasons) with "; "."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = [pc.binary_join(column, "; ") if _is_list(column.type) else column for column in batch.columns]
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def _pieces(reader: "pa.ipc.RecordBatchFileReader", columns: list[str] | None,
+            batch_rows: int) -> Iterator["pa.RecordBatch"]:
+    """Regroup the stored batches into batches of about ``batch_rows`` rows."""
+    import pyarrow as pa
+
+    pending, rows = [], 0
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        pending.append(batch.select(columns) if columns else batch)
+        rows += batch.num_rows
+        if rows >= batch_rows:
+            yield from pa.Table.from_batches(pending).combine_chunks().to_batches()
+            pending, rows = [], 0
+    if rows:
+        yield from pa.Table.from_batches(pending).combine_chunks().to_batches()
+
+
+def iter_export(reader: "pa.ipc.RecordBatchFileReader", fmt: str, columns: list[str] | None = None,
+                batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    """Encode the stored table behind ``reader`` in ``fmt``, optionally only some
+    ``columns``, and yield the output piece by piece."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    schema = reader.schema
+    if columns:
+        schema = pa.schema([schema.field(name) for name in columns])
+    sink = _Chunks()
+    if fmt == "csv":
+        writer = pa_csv.CSVWriter(sink, pa.schema([
+            pa.field(field.name, pa.string()) if _is_list(field.type) else field for field in schema
+        ]))
+        write = lambda batch: writer.write_batch(_flatten_lists(batch))
+    elif fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+        write = writer.write_batch
+    elif fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    else:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    try:
+        for batch in _pieces(reader, columns, batch_rows):
+            write(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,67 @@
+"""HTTP caching helpers for stored JSON payloads: strong ETags and precompressed variants.
+
+A payload is compressed once when it is stored, in every encoding available
+(gzip always, brotli when the optional ``brotli`` package is installed), so
+serving it costs no compression work. Its ETag is derived from the dataset's
+content fingerprint, the analysis version and the payload bytes, so it changes
+whenever the served representation could.
+"""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content-Encoding -> compressor; brotli is preferred when the client accepts both equally
+ENCODINGS = {"gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+if brotli is not None:
+    ENCODINGS["br"] = lambda data: brotli.compress(data, quality=11)
+
+
+def make_etag(fingerprint: str, version: str, payload: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (fingerprint.encode(), version.encode(), hashlib.sha256(payload).digest()):
+        digest.update(part)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def compressed_variants(payload: bytes) -> dict[str, bytes]:
+    return {encoding: compress(payload) for encoding, compress in ENCODINGS.items()}
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag`` (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def choose_encoding(accept_encoding: str | None, available) -> str | None:
+    """The preferred of the ``available`` encodings the client accepts, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in ("br", "gzip"):
+        if encoding not in available:
+            continue
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
@@ -0,0 +1,136 @@
+"""Streaming ingestion of review files.
+
+Accepts CSV, JSON Lines or a JSON array of review objects, either plain or
+compressed with gzip, bz2, xz or zstd. Compressed input is decompressed and
+parsed incrementally, chunk by chunk, and each chunk goes through
+``preprocess_dataframe`` and is pruned to the used columns. Only the normalized
+output is ever held in memory, except for JSON arrays, which are parsed whole.
+"""
+import bz2
+import gzip
+import io
+import lzma
+
+import pandas as pd
+
+from .data_processing import map_columns, preprocess_dataframe, read_reviews_csv, select_columns, USED_COLUMNS
+
+# .json files hold either a JSON array or JSON Lines; the content decides
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json"}
+COMPRESSIONS = {".gz": "gzip", ".gzip": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd", ".zstd": "zstd"}
+MAGIC_NUMBERS = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+
+# Rows parsed per chunk when streaming
+CHUNK_ROWS = 100_000
+
+
+def detect_format(filename: str) -> tuple[str, str | None]:
+    """Return ``(format, compression)`` from a name like ``reviews.jsonl.gz``."""
+    name = filename.lower()
+    compression = None
+    for ext, comp in COMPRESSIONS.items():
+        if name.endswith(ext):
+            compression = comp
+            name = name[: -len(ext)]
+            break
+    for ext, fmt in FORMATS.items():
+        if name.endswith(ext):
+            return fmt, compression
+    raise ValueError(
+        "Unsupported file type. Upload a .csv, .json or .jsonl file, "
+        "optionally compressed as .gz, .bz2, .xz or .zst"
+    )
+
+
+def _sniff_compression(stream) -> tuple[object, str | None]:
+    """Peek at the magic number without consuming it, wrapping the stream if it cannot seek."""
+    if getattr(stream, "seekable", lambda: False)():
+        start = stream.tell()
+        head = stream.read(6)
+        stream.seek(start)
+    else:
+        if not isinstance(stream, io.BufferedReader):
+            stream = io.BufferedReader(stream)
+        head = stream.peek(6)[:6]
+    for magic, compression in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return stream, compression
+    return stream, None
+
+
+def open_decompressed(stream, compression: str | None):
+    """Wrap a binary stream in a streaming decompressor."""
+    if compression is None:
+        return stream
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if compression == "bz2":
+        return bz2.BZ2File(stream, mode="rb")
+    if compression == "xz":
+        return lzma.LZMAFile(stream, mode="rb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Reading .zst files requires the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+        return io.BufferedReader(reader, buffer_size=1 << 20)
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def _is_json_array(data) -> tuple[object, bool]:
+    """Whether decompressed JSON starts with ``[``, peeked without consuming it."""
+    if not isinstance(data, io.BufferedReader):
+        data = io.BufferedReader(data)
+    head = data.peek(64).lstrip(b"\xef\xbb\xbf \t\r\n")
+    return data, head.startswith(b"[")
+
+
+def _keep_column(name) -> bool:
+    return map_columns([name])[name] in USED_COLUMNS
+
+
+def iter_review_chunks(stream, filename: str, chunk_rows: int = CHUNK_ROWS):
+    """Yield preprocessed DataFrame chunks parsed from a (possibly compressed) binary stream."""
+    fmt, compression = detect_format(filename)
+    stream, sniffed = _sniff_compression(stream)
+    data = open_decompressed(stream, sniffed or compression)
+
+    if fmt == "json":
+        data, is_array = _is_json_array(data)
+        if is_array:
+            # An array cannot be parsed incrementally: read it whole, then chunk it
+            df = pd.read_json(data, orient="records", dtype=False, convert_dates=False, encoding="utf-8")
+            for start in range(0, len(df), chunk_rows):
+                yield preprocess_dataframe(select_columns(df.iloc[start:start + chunk_rows]))
+            return
+
+    if fmt == "csv":
+        reader = pd.read_csv(data, usecols=_keep_column, dtype=str, chunksize=chunk_rows)
+    else:
+        reader = pd.read_json(
+            data, lines=True, chunksize=chunk_rows, dtype=False,
+            convert_dates=False, encoding="utf-8",
+        )
+    with reader:
+        for chunk in reader:
+            yield preprocess_dataframe(select_columns(chunk))
+
+
+def read_reviews(stream, filename: str) -> pd.DataFrame:
+    """Parse and preprocess a review file of any supported format into one DataFrame."""
+    fmt, compression = detect_format(filename)
+    stream, sniffed = _sniff_compression(stream)
+    if fmt == "csv" and not (sniffed or compression):
+        # Plain CSV: the multithreaded, column-pruned reader is the fastest path
+        return preprocess_dataframe(read_reviews_csv(stream))
+
+    chunks = list(iter_review_chunks(stream, filename))
+    if not chunks:
+        raise ValueError("File contains no reviews")
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,49 @@
+"""Event-loop lag monitor.
+
+A task sleeps for a fixed interval and records how late it wakes up. The delay
+is time the loop spent running something else without yielding, which is the
+latency every other request on this worker paid at that moment: blocking work
+done in an ``async def`` endpoint shows up here and nowhere else.
+"""
+import asyncio
+import time
+from collections import deque
+
+# How often the loop is probed, and how many recent probes are kept
+LAG_INTERVAL_SECONDS = 0.05
+LAG_WINDOW = 12_000
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = LAG_INTERVAL_SECONDS, window: int = LAG_WINDOW):
+        self.interval = interval
+        self._lags: deque[float] = deque(maxlen=window)
+
+    async def run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self._lags.append(max(0.0, time.perf_counter() - expected))
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """Lag percentiles in milliseconds over the probes since the last reset."""
+        lags = sorted(lag * 1000 for lag in self._lags)
+        if reset:
+            self._lags.clear()
+        if not lags:
+            return {"samples": 0, "interval_ms": self.interval * 1000}
+        # Plain Python, so importing the app stays free of numpy
+        percentile = lambda q: round(lags[min(len(lags) - 1, int(q / 100 * len(lags)))], 2)
+        return {
+            "samples": len(lags),
+            "interval_ms": self.interval * 1000,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": round(lags[-1], 2),
+            "mean_ms": round(sum(lags) / len(lags), 2),
+        }
+
+
+# This worker's monitor, started by the app's lifespan
+loop_lag = LoopLagMonitor()
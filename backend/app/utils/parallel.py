@@ -0,0 +1,148 @@
+"""Data-parallel execution of row-wise stages across CPU cores.
+
+A stage is a function that maps a list of review texts to one result per
+text. ``map_texts`` splits the texts into row ranges, runs the stage on every
+range in a process pool and reassembles the results in order.
+
+The texts are not pickled to the workers. They are written once as an Arrow
+IPC file in shared memory (``/dev/shm`` where available), and every task
+carries only the file path and its row range; workers memory-map the file
+and materialize just their own rows. Fitted models a stage needs (e.g. a
+topic model) are passed as arguments and pickled once per task.
+
+Stages are registered by name in STAGES and resolved inside the worker, so
+the pool never pickles functions. Inputs smaller than PARALLEL_MIN_ROWS, a
+pool of one worker, and calls made inside a pool worker all run the stage
+in the calling process.
+"""
+import atexit
+import importlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# API worker processes on this machine; uvicorn starts this many when --workers is not given
+WEB_CONCURRENCY = max(1, int(os.environ.get("WEB_CONCURRENCY") or "1"))
+# Worker processes per API worker; 0 (the default) shares the CPU cores out between the API
+# workers, so WEB_CONCURRENCY pools together start one process per core
+PARALLEL_WORKERS = int(os.environ.get("PARALLEL_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+# Smaller inputs run in the calling process: the pool round trip would cost more than it saves
+PARALLEL_MIN_ROWS = int(os.environ.get("PARALLEL_MIN_ROWS", "20000"))
+# Rows per task; small enough to balance load, large enough to amortize the dispatch
+TASK_ROWS = 10_000
+
+_package = __package__.rsplit(".", 1)[0]
+# Stage name -> (module, function) of its single-process implementation
+STAGES = {
+    "clean": (f"{_package}.utils.data_processing", "_clean_many"),
+    "tokenize": (f"{_package}.utils.data_processing", "_tokenize_many"),
+    "sentiment": (f"{_package}.analysis.sentiment", "sentiment_scores"),
+    "fake_features": (f"{_package}.analysis.fake_detection", "text_features"),
+    "topic_transform": (f"{_package}.analysis.topics", "_transform_texts"),
+}
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_in_worker = False
+
+
+def _mark_worker():
+    global _in_worker
+    _in_worker = True
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: workers start from a clean process, not a fork of a threaded server
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=PARALLEL_WORKERS,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_mark_worker,
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def warm_up_pool():
+    """Start the pool and import the stage modules in every worker ahead of the first large dataset."""
+    if PARALLEL_WORKERS > 1:
+        list(_get_pool().map(_run_warm_up, range(PARALLEL_WORKERS)))
+
+
+def _run_warm_up(_):
+    for module, _function in STAGES.values():
+        importlib.import_module(module)
+    from ..analysis.sentiment import _get_analyzer
+    _get_analyzer()
+
+
+def _stage(name: str):
+    module, function = STAGES[name]
+    return getattr(importlib.import_module(module), function)
+
+
+def _share_texts(texts) -> str:
+    """Write the texts to an Arrow IPC file in shared memory and return its path."""
+    import pyarrow as pa
+
+    # Non-text values (e.g. NaN) travel as nulls and reach the stage as empty strings
+    column = pa.array([t if isinstance(t, str) else None for t in texts], type=pa.large_string())
+    batch = pa.record_batch([column], names=["text"])
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    path = os.path.join(directory, f"reviews-{os.getpid()}-{uuid.uuid4().hex[:8]}.arrow")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return path
+
+
+def _run_task(stage: str, path: str, start: int, stop: int, args: tuple):
+    """Pool task: run a stage on rows [start, stop) of a shared texts file."""
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        column = pa.ipc.open_file(source).get_batch(0).column(0)
+        texts = [t if t is not None else "" for t in column.slice(start, stop - start).to_pylist()]
+        del column
+    return _stage(stage)(texts, *args)
+
+
+def _concat(parts: list):
+    """Join per-range results: lists, arrays, sparse matrices or tuples of those."""
+    first = parts[0]
+    if isinstance(first, tuple):
+        return tuple(_concat([p[i] for p in parts]) for i in range(len(first)))
+    if isinstance(first, list):
+        return [item for part in parts for item in part]
+    if hasattr(first, "tocsr"):
+        import scipy.sparse as sp
+        return sp.vstack(parts, format="csr")
+    return np.concatenate(parts)
+
+
+def map_texts(stage: str, texts, *args):
+    """Run a registered stage over ``texts`` on the process pool and return its results in order."""
+    if not hasattr(texts, "__len__"):
+        texts = list(texts)
+    n = len(texts)
+    if _in_worker or PARALLEL_WORKERS <= 1 or n < PARALLEL_MIN_ROWS:
+        return _stage(stage)(texts, *args)
+
+    path = _share_texts(texts)
+    try:
+        pool = _get_pool()
+        task_rows = max(1_000, min(TASK_ROWS, -(-n // PARALLEL_WORKERS)))
+        futures = [
+            pool.submit(_run_task, stage, path, start, min(start + task_rows, n), args)
+            for start in range(0, n, task_rows)
+        ]
+        return _concat([future.result() for future in futures])
+    finally:
+        os.remove(path)
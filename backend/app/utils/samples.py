@@ -0,0 +1,102 @@
+"""Manifest of the bundled sample datasets and shared, pre-parsed copies of them.
+
+The manifest (row count, columns, content hash) is recomputed only when a file's
+mtime or size changes. A loaded sample is preprocessed once and kept in the
+dataset store under an id derived from its content hash, so every "load sample"
+click after the first reuses the same memory-mapped Arrow copy.
+"""
+import csv
+import hashlib
+import json
+import os
+import threading
+
+from .storage import DatasetStore
+
+_MANIFEST_KEY = ("__samples__", "manifest")
+# Prefix of the file_id of every shared sample copy
+SAMPLE_ID_PREFIX = "sample-"
+
+
+def _scan_file(path: str) -> dict:
+    """Hash the file and count its records in one binary pass."""
+    digest = hashlib.sha256()
+    newlines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+            newlines += block.count(b"\n")
+            last = block[-1:]
+    lines = newlines + (0 if last == b"\n" else 1)
+    with open(path, encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f), [])
+    return {"review_count": max(lines - 1, 0), "columns": header, "content_hash": digest.hexdigest()}
+
+
+class SampleCatalog:
+    def __init__(self, sample_dir: str, store: DatasetStore):
+        self.sample_dir = sample_dir
+        self.store = store
+        self._lock = threading.Lock()
+        self._manifest: dict[str, dict] | None = None
+
+    def manifest(self) -> list[dict]:
+        """Return one entry per sample CSV, rescanning only files whose mtime or size changed."""
+        with self._lock:
+            if self._manifest is None:
+                cached = self.store.load_result(*_MANIFEST_KEY)
+                self._manifest = json.loads(cached) if cached else {}
+
+            entries = {}
+            changed = False
+            names = sorted(os.listdir(self.sample_dir)) if os.path.isdir(self.sample_dir) else []
+            for fname in names:
+                if not fname.endswith(".csv"):
+                    continue
+                stat = os.stat(os.path.join(self.sample_dir, fname))
+                entry = self._manifest.get(fname)
+                if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                    try:
+                        scanned = _scan_file(os.path.join(self.sample_dir, fname))
+                    except (OSError, UnicodeDecodeError):
+                        scanned = {"review_count": 0, "columns": [], "content_hash": ""}
+                    entry = {
+                        "id": fname,
+                        "name": fname.replace("_", " ").replace(".csv", "").title(),
+                        "mtime_ns": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                        **scanned,
+                    }
+                    changed = True
+                entries[fname] = entry
+            changed = changed or entries.keys() != self._manifest.keys()
+            self._manifest = entries
+            if changed:
+                self.store.save_result(*_MANIFEST_KEY, json.dumps(entries).encode("utf-8"))
+            return list(entries.values())
+
+    def get(self, dataset_id: str) -> dict | None:
+        return next((e for e in self.manifest() if e["id"] == dataset_id), None)
+
+    def load(self, dataset_id: str) -> tuple[str, int] | None:
+        """Return ``(file_id, total_rows)`` of the shared preprocessed copy of a sample."""
+        entry = self.get(dataset_id)
+        if entry is None or not entry["content_hash"]:
+            return None
+
+        file_id = f"{SAMPLE_ID_PREFIX}{entry['content_hash'][:16]}"
+        info = self.store.get_info(file_id)
+        if info is not None:
+            return file_id, info["total_rows"]
+
+        from .data_processing import preprocess_dataframe, read_reviews_csv
+
+        # Concurrent first loads parse the sample once
+        with self.store.build_lock(file_id, "raw"):
+            info = self.store.get_info(file_id)
+            if info is not None:
+                return file_id, info["total_rows"]
+            df = preprocess_dataframe(read_reviews_csv(os.path.join(self.sample_dir, dataset_id)))
+            self.store.create(df, dataset_id, file_id=file_id)
+            return file_id, len(df)
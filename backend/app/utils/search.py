@@ -0,0 +1,197 @@
+"""BM25 full-text search over the reviews of one dataset.
+
+The index is built once per dataset from the same tokens as ``tokenize``, so
+documents and queries share the cleaning rules and ``STOP_WORDS``. It is saved
+as plain numpy arrays that every worker memory-maps:
+
+- ``vocab``: the sorted terms, looked up with a binary search
+- ``term_offsets``, ``post_docs``, ``post_tfs``: each term's postings (doc ids and
+  term frequencies), concatenated in term order
+- ``doc_offsets``, ``doc_tokens``: each review's token ids in order, used to
+  verify phrase queries
+
+A query touches only the postings of its own terms, so its cost depends on how
+many reviews match rather than on the size of the dataset.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from .data_processing import encode_texts_flat, get_product_column, tokenize
+
+# BM25 term-frequency saturation and document-length normalization
+K1 = 1.2
+B = 0.75
+# Longer tokens are left out so the fixed-width vocabulary array stays small
+MAX_TERM_LENGTH = 40
+# Largest page a single search returns
+MAX_RESULTS = 500
+
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+
+
+def build_search_index(texts) -> dict[str, np.ndarray]:
+    """Tokenize every review and build the inverted and forward index arrays."""
+    ids, lengths, vocabulary = encode_texts_flat(texts)
+    n_docs = len(lengths)
+    rows = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+
+    terms = np.array(list(vocabulary), dtype=object)
+    short = np.fromiter((len(t) <= MAX_TERM_LENGTH for t in terms), dtype=bool, count=len(terms))
+    if not short.all():
+        keep = short[ids]
+        ids, rows = ids[keep], rows[keep]
+        lengths = np.bincount(rows, minlength=n_docs)
+
+    # Renumber terms in sorted order so lookups can binary-search the vocabulary
+    kept = terms[short]
+    order = np.argsort(kept, kind="stable")
+    new_ids = np.full(len(terms), -1, dtype=np.int32)
+    new_ids[np.flatnonzero(short)[order]] = np.arange(len(order), dtype=np.int32)
+    doc_tokens = new_ids[ids]
+    vocab = kept[order].astype("S") if len(order) else np.empty(0, dtype="S1")
+
+    # One posting per (term, review), ordered by term and then review
+    keys, tfs = np.unique(doc_tokens.astype(np.int64) * max(n_docs, 1) + rows, return_counts=True)
+    post_terms = keys // max(n_docs, 1)
+    term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(post_terms, minlength=len(vocab)), out=term_offsets[1:])
+    doc_offsets = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum(lengths, out=doc_offsets[1:])
+
+    return {
+        "vocab": vocab,
+        "term_offsets": term_offsets,
+        "post_docs": (keys % max(n_docs, 1)).astype(np.int32),
+        "post_tfs": tfs.astype(np.int32),
+        "doc_offsets": doc_offsets,
+        "doc_tokens": doc_tokens,
+    }
+
+
+def parse_query(query: str) -> tuple[list[str], list[list[str]]]:
+    """Split a query into optional terms and required quoted phrases, both tokenized."""
+    phrases = [tokenize(p) for p in _PHRASE_RE.findall(query)]
+    terms = list(dict.fromkeys(tokenize(_PHRASE_RE.sub(" ", query))))
+    return terms, [p for p in phrases if p]
+
+
+class SearchIndex:
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.vocab = arrays["vocab"]
+        self.term_offsets = arrays["term_offsets"]
+        self.post_docs = arrays["post_docs"]
+        self.post_tfs = arrays["post_tfs"]
+        self.doc_offsets = arrays["doc_offsets"]
+        self.doc_tokens = arrays["doc_tokens"]
+        self.n_docs = len(self.doc_offsets) - 1
+        self.avg_length = len(self.doc_tokens) / self.n_docs if self.n_docs else 1.0
+
+    def term_id(self, term: str) -> int | None:
+        key = term.encode("ascii", "ignore")
+        i = int(np.searchsorted(self.vocab, key))
+        if i < len(self.vocab) and self.vocab[i] == key:
+            return i
+        return None
+
+    def postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return np.asarray(self.post_docs[start:end]), np.asarray(self.post_tfs[start:end])
+
+    def phrase_matches(self, term_ids: list[int]) -> tuple[np.ndarray, np.ndarray]:
+        """Reviews containing the terms consecutively, and how often."""
+        candidates = None
+        for docs in sorted((self.postings(t)[0] for t in term_ids), key=len):
+            candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+        if candidates is None or not len(candidates):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+
+        # Every token slot in the candidate reviews where the phrase could start
+        starts = self.doc_offsets[candidates]
+        n_starts = np.maximum(self.doc_offsets[candidates + 1] - starts - len(term_ids) + 1, 0)
+        owner = np.repeat(np.arange(len(candidates)), n_starts)
+        slots = np.arange(n_starts.sum()) + np.repeat(starts - (np.cumsum(n_starts) - n_starts), n_starts)
+        matched = np.ones(len(slots), dtype=bool)
+        for offset, term_id in enumerate(term_ids):
+            matched &= self.doc_tokens[slots + offset] == term_id
+
+        counts = np.bincount(owner[matched], minlength=len(candidates))
+        hit = counts > 0
+        return candidates[hit], counts[hit]
+
+    def _bm25(self, docs: np.ndarray, tfs: np.ndarray) -> np.ndarray:
+        df = len(docs)
+        idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+        lengths = self.doc_offsets[docs + 1] - self.doc_offsets[docs]
+        return idf * tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * lengths / self.avg_length))
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, keep=None) -> tuple[int, np.ndarray, np.ndarray]:
+        """Rank reviews for ``query`` and return ``(total, rows, scores)`` for one page.
+
+        Unquoted terms are optional and add to the score; every quoted phrase
+        must occur, and is scored like a single term. ``keep`` is an optional
+        callable that takes candidate row ids and returns a boolean mask, for
+        filtering on other columns.
+        """
+        terms, phrases = parse_query(query)
+        scored, required = [], []
+        for term in terms:
+            term_id = self.term_id(term)
+            if term_id is not None:
+                scored.append(self.postings(term_id))
+        for phrase in phrases:
+            term_ids = [self.term_id(t) for t in phrase]
+            if None in term_ids:
+                return 0, np.empty(0, dtype=np.int64), np.empty(0)
+            matches = self.postings(term_ids[0]) if len(term_ids) == 1 else self.phrase_matches(term_ids)
+            scored.append(matches)
+            required.append(matches[0])
+        if not scored:
+            return 0, np.empty(0, dtype=np.int64), np.empty(0)
+
+        docs, inverse = np.unique(np.concatenate([d for d, _ in scored]), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate([self._bm25(d, tf) for d, tf in scored]))
+        mask = np.ones(len(docs), dtype=bool)
+        for required_docs in required:
+            mask &= np.isin(docs, required_docs, assume_unique=True)
+        docs, scores = docs[mask], scores[mask]
+        if keep is not None and len(docs):
+            mask = keep(docs)
+            docs, scores = docs[mask], scores[mask]
+
+        total = len(docs)
+        end = min(max(offset, 0) + min(max(limit, 0), MAX_RESULTS), total)
+        if end < total:
+            top = np.argpartition(-scores, end - 1)[:end] if end else np.empty(0, dtype=np.int64)
+        else:
+            top = np.arange(total)
+        top = top[np.lexsort((docs[top], -scores[top]))][max(offset, 0):end]
+        return total, docs[top].astype(np.int64), scores[top]
+
+
+def filter_rows(df: pd.DataFrame, rating: int | None = None, sentiment: str | None = None,
+                product: str | None = None, min_fake_score: float | None = None,
+                max_fake_score: float | None = None):
+    """Return a ``keep`` callable for ``SearchIndex.search`` that applies the given
+    filters to candidate rows only, or None when no filter is set."""
+    if rating is None and sentiment is None and product is None and min_fake_score is None \
+            and max_fake_score is None:
+        return None
+    product_col = get_product_column(df) if product is not None else None
+
+    def keep(rows: np.ndarray) -> np.ndarray:
+        mask = np.ones(len(rows), dtype=bool)
+        if rating is not None:
+            mask &= df["rating"].to_numpy()[rows] == rating
+        if sentiment is not None:
+            mask &= df["sentiment"].take(rows).to_numpy() == sentiment
+        if product is not None:
+            mask &= df[product_col].take(rows).astype(str).to_numpy() == product
+        if min_fake_score is not None:
+            mask &= df["fake_score"].to_numpy()[rows] >= min_fake_score
+        if max_fake_score is not None:
+            mask &= df["fake_score"].to_numpy()[rows] <= max_fake_score
+        return mask
+
+    return keep
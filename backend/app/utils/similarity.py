@@ -0,0 +1,131 @@
+""""More like this" lookup by cosine similarity over hashed term vectors.
+
+Reviews are hashed into L2-normalized term vectors with a stateless
+``HashingVectorizer`` over the project's ``tokenize``, so any batch of reviews
+can be vectorized on its own. The index is the transposed matrix: for every
+hashed term, the rows containing it and their weights. It is saved as plain
+numpy arrays that every worker memory-maps:
+
+- ``offsets``: where each term's postings start, N_FEATURES + 1 entries
+- ``rows``, ``weights``: the postings (row and term weight), concatenated in
+  term order and by row within a term
+
+The cosine similarity of a query with every review is the sum, over the query's
+terms, of the query weight times the review's weight, so a query touches only
+the postings of its own terms: its cost depends on how many reviews share its
+terms rather than on the size of the dataset. Rarest terms are scored first, up
+to MAX_POSTINGS postings per query. When a query's terms together have more,
+the rest are skipped, and the MAX_CANDIDATES best rows by partial score are
+re-ranked by exact cosine similarity.
+"""
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+from .data_processing import tokenize
+
+N_FEATURES = 2 ** 15
+# Rows vectorized at a time while building
+BUILD_BATCH = 50_000
+# Postings scored per query; beyond them, the commonest query terms are skipped
+MAX_POSTINGS = 2_000_000
+# Rows re-ranked by exact cosine similarity when some query terms were skipped
+MAX_CANDIDATES = 1000
+
+_lock = threading.Lock()
+_vectorizer = None
+
+
+def _get_vectorizer():
+    """The shared vectorizer, created on first use."""
+    global _vectorizer
+    with _lock:
+        if _vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            _vectorizer = HashingVectorizer(
+                n_features=N_FEATURES, analyzer=tokenize, alternate_sign=False, norm="l2"
+            )
+    return _vectorizer
+
+
+def vectorize(texts):
+    return _get_vectorizer().transform(["" if not isinstance(t, str) else t for t in texts])
+
+
+def build_similarity_index(texts, batch_size: int = BUILD_BATCH) -> dict[str, np.ndarray]:
+    """Hash every review, one batch at a time, and transpose the term vectors into postings."""
+    texts = list(texts)
+    batches = [
+        vectorize(texts[start:start + batch_size]).astype(np.float32)
+        for start in range(0, len(texts), batch_size)
+    ]
+    vectors = sp.vstack(batches, format="csr") if batches else sp.csr_matrix((0, N_FEATURES), dtype=np.float32)
+    postings = vectors.tocsc()
+    postings.sort_indices()
+    return {
+        "offsets": postings.indptr.astype(np.int64),
+        "rows": postings.indices.astype(np.int32),
+        "weights": postings.data,
+    }
+
+
+def _accumulate(rows: np.ndarray, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct rows and the sum of their weights."""
+    if not len(rows):
+        return rows, weights
+    size = int(rows.max()) + 1
+    if size <= 4 * len(rows):
+        # Dense enough for one pass over an array of every row up to the largest
+        sums = np.bincount(rows, weights, minlength=size)
+        found = np.flatnonzero(sums)
+        return found, sums[found]
+    found, inverse = np.unique(rows, return_inverse=True)
+    return found, np.bincount(inverse, weights)
+
+
+class SimilarityIndex:
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.offsets = arrays["offsets"]
+        self.rows = arrays["rows"]
+        self.weights = arrays["weights"]
+
+    def query(self, text: str, texts, k: int = 10, exclude: int | None = None) -> list[tuple[int, float]]:
+        """The ``k`` reviews most similar to ``text``, as ``(row, cosine similarity)`` pairs.
+
+        ``texts`` gives the review text of a row (e.g. the dataset's
+        ``review_text`` column) and is read only to re-rank candidates when some
+        query terms were skipped.
+        """
+        vector = vectorize([text])
+        if not vector.nnz:
+            return []
+        terms, query_weights = vector.indices, vector.data
+        starts, ends = self.offsets[terms], self.offsets[terms + 1]
+        by_rarity = np.argsort(ends - starts, kind="stable")
+        scored = by_rarity[np.cumsum((ends - starts)[by_rarity]) <= MAX_POSTINGS]
+        exact = len(scored) == len(terms)
+        if not len(scored):
+            # Even the rarest term is too common: score a budget's worth of its postings
+            scored = by_rarity[:1]
+            ends = ends.copy()
+            ends[scored] = starts[scored] + MAX_POSTINGS
+
+        rows, similarity = _accumulate(
+            np.concatenate([self.rows[starts[t]:ends[t]] for t in scored]),
+            np.concatenate([self.weights[starts[t]:ends[t]] * query_weights[t] for t in scored]),
+        )
+        if exclude is not None:
+            keep = rows != exclude
+            rows, similarity = rows[keep], similarity[keep]
+        if not exact and len(rows):
+            if len(rows) > MAX_CANDIDATES:
+                best = np.argpartition(-similarity, MAX_CANDIDATES - 1)[:MAX_CANDIDATES]
+                rows = np.sort(rows[best])
+            similarity = (vectorize(texts.take(rows)) @ vector.T).toarray().ravel()
+        if len(rows) > k:
+            best = np.argpartition(-similarity, k - 1)[:k]
+            rows, similarity = rows[best], similarity[best]
+        top = np.lexsort((rows, -similarity))
+        return [(int(rows[i]), float(similarity[i])) for i in top if similarity[i] > 0]
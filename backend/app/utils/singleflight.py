@@ -0,0 +1,115 @@
+"""Single-flight execution: concurrent requests for the same job share one run.
+
+Within a worker, callers that arrive while a job is running await the same
+future. Across workers, the first one to take the job's lease in SQLite leads;
+the others poll until the lease is released and then read the result the
+leader stored. The leader renews its lease with a heartbeat, so if its worker
+dies another one takes the job over once the lease goes stale.
+"""
+import asyncio
+import os
+import time
+import uuid
+from typing import Callable
+
+from .storage import DATA_DIR, connect_sqlite, init_sqlite
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    heartbeat REAL NOT NULL
+);
+"""
+
+# A leader that has not renewed its lease for this long is presumed dead
+LEASE_STALE_SECONDS = 30.0
+_HEARTBEAT_SECONDS = 5.0
+_POLL_SECONDS = 0.2
+
+
+class SingleFlight:
+    def __init__(self, root: str):
+        self.path = os.path.join(root, "leases.sqlite")
+        os.makedirs(root, exist_ok=True)
+        init_sqlite(self.path, _SCHEMA)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    # ── Cross-worker leases ──────────────────────────────────────────────
+
+    def _acquire(self, key: str, owner: str) -> bool:
+        now = time.time()
+        with connect_sqlite(self.path, immediate=True) as conn:
+            conn.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE "
+                "SET owner = excluded.owner, heartbeat = excluded.heartbeat WHERE heartbeat < ?",
+                (key, owner, now, now - LEASE_STALE_SECONDS),
+            )
+            row = conn.execute("SELECT owner FROM leases WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def _renew(self, key: str, owner: str):
+        with connect_sqlite(self.path) as conn:
+            conn.execute("UPDATE leases SET heartbeat = ? WHERE key = ? AND owner = ?", (time.time(), key, owner))
+
+    def _release(self, key: str, owner: str):
+        with connect_sqlite(self.path) as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def _held(self, key: str) -> bool:
+        with connect_sqlite(self.path) as conn:
+            row = conn.execute("SELECT heartbeat FROM leases WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] >= time.time() - LEASE_STALE_SECONDS
+
+    # ── Coalesced runs ───────────────────────────────────────────────────
+
+    async def run(self, key: str, compute: Callable[[], bytes], load: Callable[[], bytes | None]) -> bytes:
+        """Return ``compute()``, run once for all concurrent callers with the same key.
+
+        ``compute`` runs in a thread and must store its result where ``load``
+        finds it, because callers in other workers get the result from ``load``;
+        ``load`` should only return results stored after the caller arrived.
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            # The run is its own task, so a caller that disconnects does not cancel it for the others
+            flight = asyncio.ensure_future(self._lead_or_follow(key, compute, load))
+            self._inflight[key] = flight
+            flight.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(flight)
+
+    def _finish(self, key: str, flight: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not flight.cancelled():
+            # Mark a failure as retrieved even if every caller has gone away
+            flight.exception()
+
+    async def _lead_or_follow(self, key: str, compute: Callable[[], bytes],
+                              load: Callable[[], bytes | None]) -> bytes:
+        owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        while True:
+            if await asyncio.to_thread(self._acquire, key, owner):
+                return await self._lead(key, owner, compute)
+            # Another worker is running the job: wait for it to finish or die
+            while await asyncio.to_thread(self._held, key):
+                await asyncio.sleep(_POLL_SECONDS)
+            result = await asyncio.to_thread(load)
+            if result is not None:
+                return result
+
+    async def _lead(self, key: str, owner: str, compute: Callable[[], bytes]) -> bytes:
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(_HEARTBEAT_SECONDS)
+                await asyncio.to_thread(self._renew, key, owner)
+
+        beating = asyncio.create_task(heartbeat())
+        try:
+            return await asyncio.to_thread(compute)
+        finally:
+            beating.cancel()
+            await asyncio.to_thread(self._release, key, owner)
+
+
+# Shared coalescer for analyses
+analysis_flights = SingleFlight(DATA_DIR)
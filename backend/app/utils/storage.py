@@ -0,0 +1,532 @@
+"""Cross-process storage for uploaded datasets and analysis results.
+
+Datasets are written once as Arrow IPC (Feather) files and read back through a
+memory map, while a small SQLite index records what exists. Every uvicorn worker
+opens the same directory, so any worker can serve any file_id.
+
+Each worker keeps the frames it has used in memory, within MEMORY_BUDGET_MB:
+frames idle for DATASET_IDLE_TTL seconds, then the least recently used ones, are
+dropped from memory. Every frame is written to disk before it is cached, so a
+dropped frame is simply read back on its next use.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+DATA_DIR = os.environ.get(
+    "DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data"),
+)
+
+# Memory each worker may use for cached frames, and how long an unused frame stays cached
+MEMORY_BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", "1024"))
+DATASET_IDLE_TTL = float(os.environ.get("DATASET_IDLE_TTL", "1800"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    file_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    total_rows INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    file_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (file_id, kind)
+);
+CREATE TABLE IF NOT EXISTS results (
+    file_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (file_id, key)
+);
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _write_frame(df: "pd.DataFrame", path: str):
+    """Write a frame atomically so readers in other workers never see a partial file."""
+    # Unique per writer: threads of one worker may write the same frame at the same time
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    df.reset_index(drop=True).to_feather(tmp)
+    os.replace(tmp, path)
+
+
+def _read_frame(path: str) -> "pd.DataFrame":
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, memory_map=True)
+    df = table.to_pandas()
+    # Arrow hands list columns (e.g. fake_reasons) back as numpy arrays
+    for field in table.schema:
+        if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+            df[field.name] = df[field.name].map(lambda v: [] if v is None else list(v))
+    return df
+
+
+def _frame_bytes(df: "pd.DataFrame") -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _disk_bytes(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(path, name))
+            for name in os.listdir(path) if os.path.isfile(os.path.join(path, name))
+        )
+    return os.path.getsize(path) if os.path.isfile(path) else 0
+
+
+def init_sqlite(path: str, schema: str):
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(schema)
+    finally:
+        conn.close()
+
+
+@contextmanager
+def connect_sqlite(path: str, immediate: bool = False):
+    """Open a short-lived connection in a transaction; ``immediate`` takes the write lock up front."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+class DatasetStore:
+    def __init__(self, root: str, memory_budget: int = int(MEMORY_BUDGET_MB * 2 ** 20),
+                 idle_ttl: float = DATASET_IDLE_TTL):
+        self.root = root
+        self.memory_budget = memory_budget
+        self.idle_ttl = idle_ttl
+        # Cached frames in least to most recently used order, with their size and last use
+        self._frames: OrderedDict[tuple[str, str], "pd.DataFrame"] = OrderedDict()
+        self._frame_sizes: dict[tuple[str, str], int] = {}
+        self._last_used: dict[tuple[str, str], float] = {}
+        self._evictions = 0
+        self._arrays: dict[tuple[str, str], dict[str, "np.ndarray"]] = {}
+        self._lock = threading.Lock()
+        self._build_locks: dict[tuple[str, str], threading.Lock] = {}
+        os.makedirs(os.path.join(root, "datasets"), exist_ok=True)
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        init_sqlite(os.path.join(root, "index.sqlite"), _SCHEMA)
+
+    def _connect(self, immediate: bool = False):
+        return connect_sqlite(os.path.join(self.root, "index.sqlite"), immediate=immediate)
+
+    def _frame_path(self, file_id: str, kind: str) -> str:
+        return os.path.join(self.root, "datasets", f"{file_id}.{kind}.arrow")
+
+    def build_lock(self, file_id: str, kind: str) -> threading.Lock:
+        """Lock that serializes builds of one derived object of a dataset within this worker,
+        so concurrent requests compute it once; callers re-check the store after taking it."""
+        with self._lock:
+            return self._build_locks.setdefault((file_id, kind), threading.Lock())
+
+    # ── Memory governor ───────────────────────────────────────────────────
+
+    def _cache_frame(self, key: tuple[str, str], df: "pd.DataFrame"):
+        size = _frame_bytes(df)
+        with self._lock:
+            self._frames[key] = df
+            self._frames.move_to_end(key)
+            self._frame_sizes[key] = size
+            self._last_used[key] = time.monotonic()
+            self._evict(keep=key)
+
+    def _drop(self, key: tuple[str, str]):
+        self._frames.pop(key, None)
+        self._frame_sizes.pop(key, None)
+        self._last_used.pop(key, None)
+
+    def _evict(self, keep: tuple[str, str] | None = None):
+        """Drop idle frames, then least recently used ones until the cache fits the budget.
+        ``keep`` (the frame being handed out) stays even if it alone exceeds the budget."""
+        now = time.monotonic()
+        for key in [k for k, used in self._last_used.items() if now - used > self.idle_ttl and k != keep]:
+            self._drop(key)
+            self._evictions += 1
+        total = sum(self._frame_sizes.values())
+        for key in list(self._frames):
+            if total <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            total -= self._frame_sizes.get(key, 0)
+            self._drop(key)
+            self._evictions += 1
+
+    def sweep(self):
+        """Apply the idle TTL, and forget frames whose dataset another worker deleted."""
+        with self._lock:
+            self._evict()
+            cached = list(self._frames)
+            mapped = list(self._arrays)
+        gone = [key for key in cached if not os.path.isfile(self._frame_path(*key))]
+        unmapped = [key for key in mapped if not self.exists(key[0])]
+        with self._lock:
+            for key in gone:
+                self._drop(key)
+            for key in unmapped:
+                self._arrays.pop(key, None)
+
+    def memory_stats(self) -> dict:
+        """Frame cache usage of this worker, in total and per dataset."""
+        now = time.monotonic()
+        with self._lock:
+            per_dataset: dict[str, dict] = {}
+            for (file_id, kind), size in self._frame_sizes.items():
+                entry = per_dataset.setdefault(file_id, {"resident_bytes": 0, "kinds": [], "idle_seconds": None})
+                entry["resident_bytes"] += size
+                entry["kinds"].append(kind)
+                idle = round(now - self._last_used[(file_id, kind)], 1)
+                entry["idle_seconds"] = idle if entry["idle_seconds"] is None else min(entry["idle_seconds"], idle)
+            return {
+                "pid": os.getpid(),
+                "memory_budget_bytes": self.memory_budget,
+                "idle_ttl_seconds": self.idle_ttl,
+                "resident_bytes": sum(self._frame_sizes.values()),
+                "resident_frames": len(self._frames),
+                "evictions": self._evictions,
+                "datasets": per_dataset,
+            }
+
+    # ── Datasets ──────────────────────────────────────────────────────────
+
+    def create(self, df: "pd.DataFrame", filename: str, file_id: str | None = None) -> str:
+        """Persist a preprocessed dataset and return its file_id."""
+        file_id = file_id or str(uuid.uuid4())
+        self.save_frame(file_id, df, kind="raw")
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?)",
+                (file_id, filename, len(df), ",".join(map(str, df.columns)), time.time()),
+            )
+        return file_id
+
+    def exists(self, file_id: str) -> bool:
+        return self.get_info(file_id) is not None
+
+    def get_info(self, file_id: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_id, filename, total_rows, columns, created_at FROM datasets WHERE file_id = ?",
+                (file_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "file_id": row[0],
+            "filename": row[1],
+            "total_rows": row[2],
+            "columns": row[3].split(",") if row[3] else [],
+            "created_at": row[4],
+        }
+
+    def list_datasets(self) -> list[dict]:
+        """Every stored dataset, newest first, with its on-disk size and whether this
+        worker holds any of its frames in memory ("resident") or not ("spilled")."""
+        with self._connect() as conn:
+            datasets = conn.execute(
+                "SELECT file_id, filename, total_rows, created_at FROM datasets ORDER BY created_at DESC"
+            ).fetchall()
+            paths = conn.execute("SELECT file_id, path FROM frames").fetchall()
+        disk: dict[str, int] = {}
+        for file_id, path in paths:
+            disk[file_id] = disk.get(file_id, 0) + _disk_bytes(path)
+        resident = self.memory_stats()["datasets"]
+        return [
+            {
+                "file_id": file_id,
+                "filename": filename,
+                "total_rows": total_rows,
+                "created_at": created_at,
+                "state": "resident" if file_id in resident else "spilled",
+                "resident_bytes": resident.get(file_id, {}).get("resident_bytes", 0),
+                "disk_bytes": disk.get(file_id, 0),
+                "idle_seconds": resident.get(file_id, {}).get("idle_seconds"),
+            }
+            for file_id, filename, total_rows, created_at in datasets
+        ]
+
+    def delete(self, file_id: str) -> bool:
+        """Remove a dataset with all its frames, indexes and cached results."""
+        return self._remove(file_id, keep_raw=False)
+
+    def invalidate(self, file_id: str) -> bool:
+        """Remove everything derived from a dataset (enriched frames, indexes, cached
+        results) but keep the dataset itself, so it is all rebuilt on next use."""
+        return self._remove(file_id, keep_raw=True)
+
+    def _remove(self, file_id: str, keep_raw: bool) -> bool:
+        kinds = "kind != 'raw'" if keep_raw else "1"
+        with self._connect(immediate=True) as conn:
+            found = conn.execute("SELECT 1 FROM datasets WHERE file_id = ?", (file_id,)).fetchone()
+            paths = [r[0] for r in conn.execute(f"SELECT path FROM frames WHERE file_id = ? AND {kinds}", (file_id,))]
+            if not keep_raw:
+                conn.execute("DELETE FROM datasets WHERE file_id = ?", (file_id,))
+            conn.execute(f"DELETE FROM frames WHERE file_id = ? AND {kinds}", (file_id,))
+            conn.execute("DELETE FROM results WHERE file_id = ?", (file_id,))
+        with self._lock:
+            for key in [k for k in self._frames if k[0] == file_id and not (keep_raw and k[1] == "raw")]:
+                self._drop(key)
+            for key in [k for k in self._arrays if k[0] == file_id]:
+                self._arrays.pop(key, None)
+            for key in [k for k in self._build_locks if k[0] == file_id]:
+                self._build_locks.pop(key, None)
+        for path in paths:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.isfile(path):
+                os.remove(path)
+        return found is not None or bool(paths)
+
+    def fingerprint(self, file_id: str) -> str | None:
+        """SHA-256 of the dataset's stored raw frame, computed once and cached as a result."""
+        cached = self.load_result(file_id, "fingerprint")
+        if cached is not None:
+            return cached.decode()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT path FROM frames WHERE file_id = ? AND kind = 'raw'", (file_id,)
+            ).fetchone()
+        if row is None or not os.path.isfile(row[0]):
+            return None
+        digest = hashlib.sha256()
+        with open(row[0], "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.save_result(file_id, "fingerprint", digest.hexdigest().encode())
+        return digest.hexdigest()
+
+    # ── Frames (raw and enriched copies of a dataset) ─────────────────────
+
+    @staticmethod
+    def _deleted(conn: sqlite3.Connection, file_id: str) -> bool:
+        """Whether ``file_id`` names no stored dataset. Ids like ``__samples__`` hold
+        store-wide entries rather than a dataset's, and are never deleted."""
+        if file_id.startswith("__"):
+            return False
+        return conn.execute("SELECT 1 FROM datasets WHERE file_id = ?", (file_id,)).fetchone() is None
+
+    def _publish(self, file_id: str, kind: str, path: str) -> tuple[bool, str | None]:
+        """Record ``path`` as the file of ``(file_id, kind)`` and return ``(published, previous
+        path)``. Derived kinds are only recorded while the dataset exists, in the same
+        transaction, so a build finishing after a DELETE cannot resurrect a frames row."""
+        with self._connect(immediate=True) as conn:
+            if kind != "raw" and self._deleted(conn, file_id):
+                return False, None
+            row = conn.execute(
+                "SELECT path FROM frames WHERE file_id = ? AND kind = ?", (file_id, kind)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)",
+                (file_id, kind, path, time.time()),
+            )
+        return True, row[0] if row is not None else None
+
+    def save_frame(self, file_id: str, df: "pd.DataFrame", kind: str = "raw") -> bool:
+        """Store a frame; False (and nothing kept) if it is derived from a deleted dataset."""
+        path = self._frame_path(file_id, kind)
+        _write_frame(df, path)
+        published, _ = self._publish(file_id, kind, path)
+        if not published:
+            os.remove(path)
+            return False
+        self._cache_frame((file_id, kind), df.reset_index(drop=True))
+        return True
+
+    def load_frame(self, file_id: str, kind: str = "raw") -> "pd.DataFrame | None":
+        key = (file_id, kind)
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+                self._last_used[key] = time.monotonic()
+                return df
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT path FROM frames WHERE file_id = ? AND kind = ?", (file_id, kind)
+            ).fetchone()
+        if row is None or not os.path.isfile(row[0]):
+            return None
+        df = _read_frame(row[0])
+        self._cache_frame(key, df)
+        return df
+
+    def open_frame(self, file_id: str, kind: str = "raw") -> "pa.ipc.RecordBatchFileReader | None":
+        """Open a stored frame for reading batch by batch through a memory map; a batch
+        is only read (and decompressed) when requested."""
+        import pyarrow as pa
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT path FROM frames WHERE file_id = ? AND kind = ?", (file_id, kind)
+            ).fetchone()
+        if row is None or not os.path.isfile(row[0]):
+            return None
+        return pa.ipc.open_file(pa.memory_map(row[0]))
+
+    # ── Array bundles (memory-mapped numpy arrays, e.g. search indexes) ──
+
+    def save_arrays(self, file_id: str, kind: str, arrays: dict[str, "np.ndarray"]) -> bool:
+        """Write each array as an .npy file in a new directory and publish it atomically.
+
+        The previous bundle of the same kind is removed; workers that still map
+        it keep reading their copy until they reload. Returns False, and removes
+        the new bundle, if the dataset was deleted meanwhile.
+        """
+        import numpy as np
+
+        path = os.path.join(self.root, "datasets", f"{file_id}.{kind}.{uuid.uuid4().hex[:8]}")
+        tmp = f"{path}.tmp"
+        os.makedirs(tmp)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), array, allow_pickle=False)
+        os.replace(tmp, path)
+        published, previous = self._publish(file_id, kind, path)
+        if not published:
+            shutil.rmtree(path, ignore_errors=True)
+            return False
+        if previous is not None and previous != path:
+            shutil.rmtree(previous, ignore_errors=True)
+        with self._lock:
+            self._arrays.pop((file_id, kind), None)
+        return True
+
+    def load_arrays(self, file_id: str, kind: str) -> dict[str, "np.ndarray"] | None:
+        """Memory-map a bundle written by ``save_arrays``; nothing is read until used."""
+        import numpy as np
+
+        with self._lock:
+            arrays = self._arrays.get((file_id, kind))
+        if arrays is not None:
+            return arrays
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT path FROM frames WHERE file_id = ? AND kind = ?", (file_id, kind)
+            ).fetchone()
+        if row is None or not os.path.isdir(row[0]):
+            return None
+        arrays = {
+            name[:-4]: np.load(os.path.join(row[0], name), mmap_mode="r", allow_pickle=False)
+            for name in os.listdir(row[0]) if name.endswith(".npy")
+        }
+        with self._lock:
+            self._arrays[(file_id, kind)] = arrays
+        return arrays
+
+    # ── Analysis results (encoded JSON payloads) ──────────────────────────
+
+    def save_result(self, file_id: str, key: str, payload: bytes) -> bool:
+        return self.save_results(file_id, {key: payload})
+
+    def save_results(self, file_id: str, payloads: dict[str, bytes]) -> bool:
+        """Store several payloads in one transaction, so readers see all of them or none.
+        Returns False, storing nothing, if the dataset was deleted meanwhile."""
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            if self._deleted(conn, file_id):
+                return False
+            conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                [(file_id, key, payload, now) for key, payload in payloads.items()],
+            )
+        return True
+
+    def load_results(self, file_id: str, keys: list[str]) -> dict[str, bytes]:
+        """Read several payloads from one snapshot; missing keys are left out."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT key, payload FROM results WHERE file_id = ? AND key IN ({', '.join('?' * len(keys))})",
+                (file_id, *keys),
+            ).fetchall()
+        return dict(rows)
+
+    def load_result(self, file_id: str, key: str, since: float | None = None) -> bytes | None:
+        """Return a stored payload; with ``since``, only one saved at or after that time."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM results WHERE file_id = ? AND key = ? AND created_at >= ?",
+                (file_id, key, since or 0.0),
+            ).fetchone()
+        return row[0] if row else None
+
+    # ── Versioned shared objects (e.g. the fitted rating predictor) ───────
+
+    def save_object(self, key: str, obj) -> int:
+        """Publish a new version of a pickled object and return its version number."""
+        with self._connect(immediate=True) as conn:
+            row = conn.execute("SELECT version FROM objects WHERE key = ?", (key,)).fetchone()
+            version = (row[0] if row else 0) + 1
+            path = os.path.join(self.root, "objects", f"{key}.{version}.pkl")
+            tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            conn.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)",
+                (key, version, path, time.time()),
+            )
+        stale = os.path.join(self.root, "objects", f"{key}.{version - 1}.pkl")
+        if os.path.exists(stale):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        return version
+
+    def object_version(self, key: str) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM objects WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def load_object(self, key: str) -> tuple[int, object] | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT version, path FROM objects WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(row[1], "rb") as f:
+                return row[0], pickle.load(f)
+        except FileNotFoundError:
+            # A newer version replaced this file between the query and the open
+            return None
+
+
+# Shared store used by every worker process
+dataset_store = DatasetStore(DATA_DIR)
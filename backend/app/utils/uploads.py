@@ -0,0 +1,318 @@
+"""Resumable chunked uploads that are parsed while they are still arriving.
+
+A session is created with a filename, then its bytes are PUT in order at
+explicit offsets and appended to a spool file in the shared data directory.
+A parser thread tails that file through ``iter_review_chunks``, so decompression
+and parsing overlap with the network transfer. An interrupted client asks for
+the received offset and continues from there.
+
+Session state lives in SQLite next to the dataset store, so chunks and
+finalize calls may hit any worker. The parser records a heartbeat. If its
+worker dies, the next chunk or finalize call in another worker takes over
+and re-parses the spool from the start.
+
+A session that receives no chunk for UPLOAD_IDLE_TTL seconds before it is
+finalized expires: its parser stops, and ``sweep`` later deletes its spool file
+and row, as it does for finished sessions once they are that old.
+"""
+import io
+import os
+import threading
+import time
+import uuid
+
+from .storage import DATA_DIR, DatasetStore, connect_sqlite, init_sqlite, dataset_store
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    upload_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    received INTEGER NOT NULL,
+    total_size INTEGER,
+    finalized INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    file_id TEXT,
+    total_rows INTEGER,
+    columns TEXT,
+    error TEXT,
+    parser_pid INTEGER,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL
+);
+"""
+
+# Largest chunk accepted by a single PUT
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+# A parser that has not reported for this long is presumed dead
+PARSER_STALE_SECONDS = 15.0
+_HEARTBEAT_SECONDS = 2.0
+# The parser polls for new bytes this often, backing off to the maximum while none arrive
+_POLL_SECONDS = 0.05
+_MAX_POLL_SECONDS = 1.0
+# Unfinalized sessions idle this long expire; finished ones are deleted once this old
+UPLOAD_IDLE_TTL = float(os.environ.get("UPLOAD_IDLE_TTL", "3600"))
+
+
+class UploadConflict(Exception):
+    """Raised when a chunk does not start at the session's received offset."""
+
+    def __init__(self, received: int):
+        super().__init__(f"Expected chunk at offset {received}")
+        self.received = received
+
+
+class _SpoolReader(io.RawIOBase):
+    """Read a spool file that is still being appended to.
+
+    At end of file it waits for more bytes until the session is finalized, and
+    reports a heartbeat so other workers know the parser is alive.
+    """
+
+    def __init__(self, sessions: "UploadSessions", upload_id: str):
+        self._sessions = sessions
+        self._upload_id = upload_id
+        self._file = open(sessions.spool_path(upload_id), "rb")
+        self._last_beat = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def _beat(self):
+        now = time.time()
+        if now - self._last_beat >= _HEARTBEAT_SECONDS:
+            self._sessions._heartbeat(self._upload_id)
+            self._last_beat = now
+
+    def readinto(self, buffer) -> int:
+        poll = _POLL_SECONDS
+        while True:
+            self._beat()
+            n = self._file.readinto(buffer)
+            if n:
+                return n
+            session = self._sessions.get(self._upload_id)
+            if session is None or session["status"] in ("cancelled", "expired"):
+                raise IOError(f"Upload session was {session['status'] if session else 'cancelled'}")
+            if session["finalized"] and self._file.tell() >= session["received"]:
+                return 0
+            if not session["finalized"] and self._sessions._idle(session) > self._sessions.idle_ttl:
+                self._sessions._expire(self._upload_id)
+                raise IOError("Upload session expired")
+            time.sleep(poll)
+            poll = min(poll * 2, _MAX_POLL_SECONDS)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class UploadSessions:
+    def __init__(self, root: str, store: DatasetStore, idle_ttl: float = UPLOAD_IDLE_TTL):
+        self.root = os.path.join(root, "uploads")
+        self.store = store
+        self.idle_ttl = idle_ttl
+        self._db = os.path.join(root, "uploads.sqlite")
+        os.makedirs(self.root, exist_ok=True)
+        init_sqlite(self._db, _SCHEMA)
+        with connect_sqlite(self._db, immediate=True) as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(upload_sessions)")}
+            if "updated_at" not in columns:
+                conn.execute("ALTER TABLE upload_sessions ADD COLUMN updated_at REAL")
+
+    def spool_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, f"{upload_id}.part")
+
+    def get(self, upload_id: str) -> dict | None:
+        with connect_sqlite(self._db) as conn:
+            conn.row_factory = lambda cur, row: {d[0]: v for d, v in zip(cur.description, row)}
+            return conn.execute(
+                "SELECT * FROM upload_sessions WHERE upload_id = ?", (upload_id,)
+            ).fetchone()
+
+    def create(self, filename: str, total_size: int | None = None) -> dict:
+        """Open a session and start parsing in this worker as soon as bytes arrive."""
+        upload_id = str(uuid.uuid4())
+        open(self.spool_path(upload_id), "wb").close()
+        with connect_sqlite(self._db, immediate=True) as conn:
+            conn.execute(
+                "INSERT INTO upload_sessions (upload_id, filename, received, total_size, finalized, "
+                "status, created_at, updated_at) VALUES (?, ?, 0, ?, 0, 'receiving', ?, ?)",
+                (upload_id, filename, total_size, time.time(), time.time()),
+            )
+        self._ensure_parser(upload_id)
+        return self.get(upload_id)
+
+    def append(self, upload_id: str, offset: int, data: bytes) -> int:
+        """Write a chunk at ``offset`` and return the new received size.
+
+        A retried chunk that was already stored is accepted without rewriting it.
+        """
+        with connect_sqlite(self._db, immediate=True) as conn:
+            row = conn.execute(
+                "SELECT received, finalized, total_size, status, error FROM upload_sessions WHERE upload_id = ?",
+                (upload_id,),
+            ).fetchone()
+            if row is None:
+                raise KeyError(upload_id)
+            received, finalized, total_size, status, error = row
+            if status == "error":
+                raise ValueError(error)
+            if status in ("cancelled", "expired"):
+                raise KeyError(upload_id)
+            if offset + len(data) <= received:
+                return received
+            if offset != received or finalized:
+                raise UploadConflict(received)
+            if total_size is not None and offset + len(data) > total_size:
+                raise ValueError("Chunk extends past the declared total_size")
+            with open(self.spool_path(upload_id), "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+            received = offset + len(data)
+            conn.execute(
+                "UPDATE upload_sessions SET received = ?, updated_at = ? WHERE upload_id = ?",
+                (received, time.time(), upload_id),
+            )
+        self._ensure_parser(upload_id)
+        return received
+
+    def finalize(self, upload_id: str) -> dict:
+        with connect_sqlite(self._db, immediate=True) as conn:
+            row = conn.execute(
+                "SELECT received, total_size, status FROM upload_sessions WHERE upload_id = ?", (upload_id,)
+            ).fetchone()
+            if row is None or row[2] in ("cancelled", "expired"):
+                raise KeyError(upload_id)
+            received, total_size, _status = row
+            if total_size is not None and received != total_size:
+                raise ValueError(f"Received {received} of {total_size} bytes")
+            conn.execute(
+                "UPDATE upload_sessions SET finalized = 1, total_size = ?, updated_at = ? WHERE upload_id = ?",
+                (received, time.time(), upload_id),
+            )
+        self._ensure_parser(upload_id)
+        return self.get(upload_id)
+
+    def cancel(self, upload_id: str):
+        with connect_sqlite(self._db, immediate=True) as conn:
+            conn.execute(
+                "UPDATE upload_sessions SET status = 'cancelled', updated_at = ? WHERE upload_id = ? AND status != 'done'",
+                (time.time(), upload_id),
+            )
+        self._remove_spool(upload_id)
+
+    def describe(self, upload_id: str) -> dict | None:
+        """Public view of a session; ``parsing`` means finalized but not yet parsed."""
+        session = self.get(upload_id)
+        if session is None:
+            return None
+        status = session["status"]
+        if status == "receiving" and session["finalized"]:
+            status = "parsing"
+        return {
+            "upload_id": upload_id,
+            "filename": session["filename"],
+            "received": session["received"],
+            "total_size": session["total_size"],
+            "status": status,
+            "file_id": session["file_id"],
+            "total_rows": session["total_rows"],
+            "columns": session["columns"].split(",") if session["columns"] else [],
+            "error": session["error"],
+        }
+
+    def _idle(self, session: dict) -> float:
+        return time.time() - (session["updated_at"] or session["created_at"])
+
+    def _expire(self, upload_id: str):
+        with connect_sqlite(self._db, immediate=True) as conn:
+            conn.execute(
+                "UPDATE upload_sessions SET status = 'expired', updated_at = ? "
+                "WHERE upload_id = ? AND status = 'receiving' AND finalized = 0",
+                (time.time(), upload_id),
+            )
+
+    def sweep(self):
+        """Expire idle unfinalized sessions, and delete the rows and spool files of sessions
+        that have been finished (done, failed, cancelled or expired) for UPLOAD_IDLE_TTL."""
+        cutoff = time.time() - self.idle_ttl
+        with connect_sqlite(self._db, immediate=True) as conn:
+            conn.execute(
+                "UPDATE upload_sessions SET status = 'expired', updated_at = ? WHERE status = 'receiving' "
+                "AND finalized = 0 AND COALESCE(updated_at, created_at) < ?",
+                (time.time(), cutoff),
+            )
+            stale = [r[0] for r in conn.execute(
+                "SELECT upload_id FROM upload_sessions WHERE status != 'receiving' "
+                "AND COALESCE(updated_at, created_at) < ?", (cutoff,),
+            )]
+            conn.executemany("DELETE FROM upload_sessions WHERE upload_id = ?", [(u,) for u in stale])
+            live = {r[0] for r in conn.execute("SELECT upload_id FROM upload_sessions")}
+        for upload_id in stale:
+            self._remove_spool(upload_id)
+        # Spool files whose session row is gone (e.g. written by a crashed worker)
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".part") and name[:-5] not in live and os.path.getmtime(path) < cutoff:
+                self._remove_spool(name[:-5])
+
+    def _heartbeat(self, upload_id: str):
+        with connect_sqlite(self._db, immediate=True) as conn:
+            conn.execute(
+                "UPDATE upload_sessions SET heartbeat = ? WHERE upload_id = ?", (time.time(), upload_id)
+            )
+
+    def _ensure_parser(self, upload_id: str):
+        """Start a parser here unless a live one already owns the session."""
+        now = time.time()
+        with connect_sqlite(self._db, immediate=True) as conn:
+            claimed = conn.execute(
+                "UPDATE upload_sessions SET parser_pid = ?, heartbeat = ? "
+                "WHERE upload_id = ? AND status = 'receiving' "
+                "AND (parser_pid IS NULL OR heartbeat < ?)",
+                (os.getpid(), now, upload_id, now - PARSER_STALE_SECONDS),
+            ).rowcount
+        if claimed:
+            threading.Thread(target=self._parse, args=(upload_id,), daemon=True).start()
+
+    def _parse(self, upload_id: str):
+        from .ingest import iter_review_chunks
+        import pandas as pd
+
+        session = self.get(upload_id)
+        try:
+            with _SpoolReader(self, upload_id) as reader:
+                chunks = list(iter_review_chunks(io.BufferedReader(reader, 1 << 20), session["filename"]))
+            if not chunks:
+                raise ValueError("File contains no reviews")
+            # Keep other workers from taking over while the dataset is written
+            with connect_sqlite(self._db, immediate=True) as conn:
+                conn.execute(
+                    "UPDATE upload_sessions SET heartbeat = ? WHERE upload_id = ?",
+                    (time.time() + 10 * PARSER_STALE_SECONDS, upload_id),
+                )
+            df = pd.concat(chunks, ignore_index=True)
+            file_id = self.store.create(df, session["filename"])
+            update = ("done", file_id, len(df), ",".join(map(str, df.columns)), None)
+        except Exception as e:
+            update = ("error", None, None, None, str(e))
+
+        with connect_sqlite(self._db, immediate=True) as conn:
+            conn.execute(
+                "UPDATE upload_sessions SET status = ?, file_id = ?, total_rows = ?, columns = ?, error = ?, "
+                "updated_at = ? WHERE upload_id = ? AND status = 'receiving'",
+                (*update, time.time(), upload_id),
+            )
+        session = self.get(upload_id)
+        if update[0] == "done" or (session is not None and session["status"] == "expired"):
+            self._remove_spool(upload_id)
+
+    def _remove_spool(self, upload_id: str):
+        try:
+            os.remove(self.spool_path(upload_id))
+        except OSError:
+            pass
+
+
+upload_sessions = UploadSessions(DATA_DIR, dataset_store)
@@ -1,9 +1,30 @@
-"""Generate a synthetic sample dataset with realistic product-specific reviews."""
+"""Generate synthetic review datasets with realistic product-specific reviews.
+
+Without arguments, writes the bundled sample dataset (sample_data/amazon_reviews.csv).
+With --rows, writes a dataset of any size for scale testing, e.g.
+
+    python generate_sample_data.py --rows 20000000 --format parquet --products 5000 --seed 7
+
+Rows are sampled with numpy in chunks of --chunk-rows, each chunk in a worker
+process with its own random stream derived from the seed and the chunk number,
+so the output is identical for any number of workers. Chunks are encoded in the
+workers and written in order as they complete, so memory stays bounded by a few
+chunks however many rows are written. Products are drawn from a Zipf
+distribution over --products synthetic products (built from the catalog below),
+and fake, duplicate and burst reviews are injected at the requested rates.
+"""
+import argparse
 import csv
 import random
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
 
-random.seed(42)
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 
 # ── Product catalog ──────────────────────────────────────────────────────────
 
@@ -187,6 +208,8 @@ FAKE_NEGATIVE_TEXT_HIGH_RATING = [
 ]
 
 
+# ── Bundled sample dataset ───────────────────────────────────────────────────
+
 def generate_date():
     year = random.choice([2023, 2024])
     month = random.randint(1, 12)
@@ -202,7 +225,8 @@ def vary_text(text: str) -> str:
     return random.choice(prefixes) + text + random.choice(suffixes)
 
 
-def main():
+def generate_sample():
+    random.seed(42)
     rows = []
 
     for product_name, info in PRODUCTS.items():
@@ -259,5 +283,242 @@ def main():
     print(f"Generated {len(rows)} reviews -> {out_path}")
 
 
+# ── Scale datasets ───────────────────────────────────────────────────────────
+
+OUTPUT_FORMATS = ("csv", "jsonl", "parquet")
+# Share of positive, negative and neutral organic reviews, and their ratings (as in the bundled sample)
+CLASS_SHARES = np.array([60, 30, 15]) / 105
+POSITIVE_RATINGS, NEGATIVE_RATINGS = np.array([4, 4, 5, 5, 5]), np.array([1, 1, 2, 2])
+PREFIXES = ["", "Overall, ", "Honestly, ", "I think ", "In my opinion, "]
+# Share of injected fakes whose text contradicts their five stars (the rest are spammy praise)
+MISMATCHED_FAKE_SHARE = 0.4
+# Reviews in one injected burst: same product, same day, five stars, praise
+BURST_SIZE = 25
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _neutral_texts() -> list[str]:
+    texts = []
+    for template in NEUTRAL_TEMPLATES:
+        if "{" in template:
+            texts += [template.format(feature=f, issue=i) for f in NEUTRAL_FEATURES for i in NEUTRAL_ISSUES]
+        else:
+            texts.append(template)
+    return texts
+
+
+class TextPool:
+    """Every review text the generator can emit, in one Arrow array that rows index into.
+
+    Organic texts are grouped by catalog template and class (positive, negative,
+    neutral), each with every prefix, so choosing a row's text is choosing an integer.
+    """
+
+    def __init__(self):
+        texts, offsets, counts = [], [], []
+        neutral = _neutral_texts()
+        for info in PRODUCTS.values():
+            offsets.append([])
+            counts.append([])
+            for base in (info["positive"], info["negative"], neutral):
+                offsets[-1].append(len(texts))
+                counts[-1].append(len(base) * len(PREFIXES))
+                texts += [prefix + text for text in base for prefix in PREFIXES]
+        self.offsets, self.counts = np.array(offsets), np.array(counts)
+        self.fake_offset = len(texts)
+        texts += FAKE_POSITIVE + FAKE_NEGATIVE_TEXT_HIGH_RATING
+        self.texts = pa.array(texts, type=pa.string())
+
+    def organic(self, rng, template: np.ndarray, cls: np.ndarray) -> np.ndarray:
+        return self.offsets[template, cls] + (rng.random(len(template)) * self.counts[template, cls]).astype(np.int64)
+
+    def fake(self, rng, size: int) -> np.ndarray:
+        mismatched = rng.random(size) < MISMATCHED_FAKE_SHARE
+        return self.fake_offset + np.where(
+            mismatched,
+            len(FAKE_POSITIVE) + rng.integers(0, len(FAKE_NEGATIVE_TEXT_HIGH_RATING), size),
+            rng.integers(0, len(FAKE_POSITIVE), size),
+        )
+
+
+class Catalog:
+    """``n`` products cycling through the catalog templates, with Zipf(``exponent``) popularity.
+
+    The first products keep the catalog's ids and names; later ones are numbered variants.
+    """
+
+    def __init__(self, n: int, exponent: float):
+        names = list(PRODUCTS)
+        self.template = np.arange(n) % len(names)
+        self.ids = pa.array([
+            PRODUCTS[names[i]]["id"] if i < len(names) else f"SYN{i:010d}" for i in range(n)
+        ])
+        self.names = pa.array([
+            names[i] if i < len(names) else f"{names[i % len(names)]} #{i // len(names)}" for i in range(n)
+        ])
+        weights = 1.0 / np.arange(1, n + 1) ** exponent
+        self.cumulative = np.cumsum(weights) / weights.sum()
+
+    def sample(self, rng, size: int) -> np.ndarray:
+        return np.minimum(np.searchsorted(self.cumulative, rng.random(size)), len(self.cumulative) - 1)
+
+
+def generate_chunk(config: dict, pool: TextPool, catalog: Catalog, index: int) -> pa.RecordBatch:
+    """Rows [index * chunk_rows, ...) of the dataset, drawn from the chunk's own random stream."""
+    rng = np.random.default_rng([config["seed"], index])
+    n = min(config["chunk_rows"], config["rows"] - index * config["chunk_rows"])
+
+    product = catalog.sample(rng, n)
+    cls = rng.choice(3, size=n, p=CLASS_SHARES)
+    text = pool.organic(rng, catalog.template[product], cls)
+    rating = np.where(
+        cls == 0, rng.choice(POSITIVE_RATINGS, n), np.where(cls == 1, rng.choice(NEGATIVE_RATINGS, n), 3)
+    )
+    day = rng.integers(config["start_day"], config["end_day"] + 1, n)
+    reviewer = rng.integers(0, config["reviewers"], n)
+
+    fake = np.flatnonzero(rng.random(n) < config["fake_rate"])
+    text[fake] = pool.fake(rng, len(fake))
+    rating[fake] = 5
+
+    bursts = rng.binomial(n // BURST_SIZE, config["burst_rate"]) if n >= BURST_SIZE else 0
+    if bursts:
+        rows = rng.choice(n, size=(bursts, BURST_SIZE), replace=False)
+        burst_product = np.repeat(catalog.sample(rng, bursts), BURST_SIZE)
+        rows = rows.ravel()
+        product[rows] = burst_product
+        text[rows] = pool.organic(rng, catalog.template[burst_product], np.zeros(len(rows), dtype=np.int64))
+        rating[rows] = 5
+        day[rows] = np.repeat(rng.integers(config["start_day"], config["end_day"] + 1, bursts), BURST_SIZE)
+
+    # Exact copies of other rows of the chunk: same text, rating, day, product and reviewer
+    duplicate = np.flatnonzero(rng.random(n) < config["duplicate_rate"])
+    source = rng.integers(0, n, len(duplicate))
+    for column in (text, rating, day, product, reviewer):
+        column[duplicate] = column[source]
+
+    return pa.record_batch({
+        "review_text": pool.texts.take(text),
+        "rating": pa.array(rating, type=pa.int64()),
+        "date": pa.array(day, type=pa.int32()).cast(pa.date32()),
+        "product_id": catalog.ids.take(product),
+        "product_name": catalog.names.take(product),
+        "reviewer_id": pc.binary_join_element_wise("U", pa.array(reviewer).cast(pa.string()), ""),
+    })
+
+
+def encode_chunk(batch: pa.RecordBatch, fmt: str, header: bool):
+    """CSV and JSONL chunks are encoded where they are generated; Parquet is encoded by its writer."""
+    import pyarrow.csv as pa_csv
+
+    if fmt == "csv":
+        sink = pa.BufferOutputStream()
+        pa_csv.write_csv(batch, sink, pa_csv.WriteOptions(include_header=header, quoting_style="needed"))
+        return sink.getvalue().to_pybytes()
+    if fmt == "jsonl":
+        df = batch.to_pandas()
+        df["date"] = df["date"].astype(str)
+        return df.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+    return batch
+
+
+_worker: dict = {}
+
+
+def _init_worker(config: dict):
+    _worker.update(config=config, pool=TextPool(), catalog=Catalog(config["products"], config["zipf"]))
+
+
+def _generate(index: int):
+    batch = generate_chunk(_worker["config"], _worker["pool"], _worker["catalog"], index)
+    return encode_chunk(batch, _worker["config"]["format"], header=index == 0)
+
+
+def generate_dataset(out_path: str, rows: int, fmt: str = "csv", products: int = 100, zipf: float = 1.1,
+                     start: str = "2023-01-01", end: str = "2024-12-31", fake_rate: float = 0.05,
+                     duplicate_rate: float = 0.01, burst_rate: float = 0.01, reviewers: int | None = None,
+                     seed: int = 42, workers: int | None = None, chunk_rows: int = 250_000):
+    """Write ``rows`` synthetic reviews to ``out_path`` as CSV, JSON Lines or Parquet."""
+    import pyarrow.parquet as pq
+
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    config = {
+        "rows": rows, "format": fmt, "products": products, "zipf": zipf,
+        "start_day": date.fromisoformat(start).toordinal() - _EPOCH,
+        "end_day": date.fromisoformat(end).toordinal() - _EPOCH,
+        "fake_rate": fake_rate, "duplicate_rate": duplicate_rate, "burst_rate": burst_rate,
+        "reviewers": reviewers or max(1, rows // 4), "seed": seed, "chunk_rows": chunk_rows,
+    }
+    if config["end_day"] < config["start_day"]:
+        raise ValueError("end date is before start date")
+    chunks = -(-rows // chunk_rows)
+    workers = max(1, min(workers or os.cpu_count() or 1, chunks))
+
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    parquet = None
+    with open(tmp, "wb") as f:
+        def write(chunk):
+            nonlocal parquet
+            if fmt != "parquet":
+                f.write(chunk)
+                return
+            if parquet is None:
+                parquet = pq.ParquetWriter(f, chunk.schema, compression="zstd")
+            parquet.write_batch(chunk)
+
+        if workers == 1:
+            _init_worker(config)
+            for index in range(chunks):
+                write(_generate(index))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(config,)) as executor:
+                # A bounded window of chunks in flight keeps memory flat and the output in order
+                pending = deque()
+                for index in range(chunks):
+                    pending.append(executor.submit(_generate, index))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        if parquet is not None:
+            parquet.close()
+    os.replace(tmp, out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, help="rows to generate; without it, writes the bundled sample")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv")
+    parser.add_argument("--out", help="output path (default: synthetic_reviews.<format>)")
+    parser.add_argument("--products", type=int, default=100, help="number of products")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument("--start", default="2023-01-01", help="first review date (YYYY-MM-DD)")
+    parser.add_argument("--end", default="2024-12-31", help="last review date (YYYY-MM-DD)")
+    parser.add_argument("--fake-rate", type=float, default=0.05, help="share of fake reviews")
+    parser.add_argument("--duplicate-rate", type=float, default=0.01, help="share of exact duplicate rows")
+    parser.add_argument("--burst-rate", type=float, default=0.01,
+                        help=f"share of rows in review bursts ({BURST_SIZE} five-star reviews of a product on one day)")
+    parser.add_argument("--reviewers", type=int, help="distinct reviewers (default: rows / 4)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--chunk-rows", type=int, default=250_000, help="rows generated per task")
+    args = parser.parse_args()
+
+    if args.rows is None:
+        generate_sample()
+        return
+    out_path = args.out or f"synthetic_reviews.{args.format}"
+    started = time.perf_counter()
+    generate_dataset(
+        out_path, args.rows, fmt=args.format, products=args.products, zipf=args.zipf,
+        start=args.start, end=args.end, fake_rate=args.fake_rate, duplicate_rate=args.duplicate_rate,
+        burst_rate=args.burst_rate, reviewers=args.reviewers, seed=args.seed,
+        workers=args.workers, chunk_rows=args.chunk_rows,
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Generated {args.rows} reviews -> {out_path} in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s)")
+
+
 if __name__ == "__main__":
     main()
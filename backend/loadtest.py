@@ -0,0 +1,344 @@
+"""End-to-end HTTP load test of the API under a concurrent mix of endpoints.
+
+Starts the app with uvicorn on a free port and a fresh data directory (or targets
+a running one with --url), prepares a dataset and a trained predictor, then has
+--concurrency virtual users send a weighted mix of requests for --duration
+seconds, e.g.
+
+    python loadtest.py --concurrency 16 --duration 60 --mix predict=70,analyze=10,load-sample=10,upload=10
+
+Each user keeps one keep-alive connection and draws its requests from its own
+random stream derived from --seed, so a run is reproducible. Requests sent during
+the --warmup period are not recorded. The report gives, per endpoint and overall,
+throughput, error counts and p50/p95/p99 latency, plus the server's event-loop
+lag over the measured window (from /api/metrics/event-loop). It is printed as a
+table and written as JSON to --output; --compare prints the change against the
+JSON of an earlier run, e.g. one from another commit.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_CSV = os.path.join(BACKEND_DIR, "sample_data", "amazon_reviews.csv")
+DEFAULT_MIX = "predict=70,analyze=10,load-sample=10,upload=10"
+
+PREDICT_TEXTS = [
+    "Battery died after a week, terrible purchase.",
+    "Absolutely love it, the sound quality is fantastic and it fits perfectly.",
+    "It's okay. Does the job but nothing special for the price.",
+    "Stopped working after two months and support never replied.",
+    "Great value, fast shipping, would buy again.",
+]
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _multipart(filename: str, data: bytes) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: text/csv\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    """One keep-alive HTTP connection; reconnects after a connection error."""
+
+    def __init__(self, base_url: str, timeout: float):
+        url = urlsplit(base_url)
+        self.host, self.port, self.timeout = url.hostname, url.port or 80, timeout
+        self.conn = None
+        # Retry-After of the last response, in seconds
+        self.retry_after = 0.0
+
+    def request(self, method: str, path: str, params: dict | None = None, body: bytes | None = None,
+                headers: dict | None = None) -> tuple[int, bytes]:
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        # A kept-alive connection the server has since closed gets one retry on a new connection
+        for attempt in range(2):
+            reused = self.conn is not None
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                self.retry_after = float(response.getheader("Retry-After") or 0)
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if not reused:
+                    break
+        return 0, b""
+
+    def json(self, method: str, path: str, **kwargs):
+        status, body = self.request(method, path, **kwargs)
+        if status != 200:
+            raise RuntimeError(f"{method} {path} failed with status {status}: {body[:200]!r}")
+        return json.loads(body)
+
+
+class Workload:
+    """The endpoints of the mix, and the datasets they work on."""
+
+    def __init__(self, client: Client, upload_data: bytes):
+        self.upload_data = upload_data
+        samples = client.json("GET", "/api/sample-data")
+        if not samples:
+            raise RuntimeError("the server has no sample dataset to load")
+        self.sample_id = samples[0]["id"]
+        # Analyses pick among every dataset seen so far, including uploaded ones
+        self.file_ids = [client.json("POST", f"/api/load-sample/{self.sample_id}")["file_id"]]
+        self._lock = threading.Lock()
+        # The predictor is trained by the first analysis
+        client.json("POST", "/api/analyze", params={"file_id": self.file_ids[0]})
+
+    def send(self, name: str, client: Client, rng: random.Random) -> int:
+        if name == "predict":
+            body = json.dumps({"text": rng.choice(PREDICT_TEXTS)}).encode()
+            return client.request("POST", "/api/predict", body=body, headers={"Content-Type": "application/json"})[0]
+        if name == "analyze":
+            with self._lock:
+                file_id = rng.choice(self.file_ids)
+            return client.request("POST", "/api/analyze", params={"file_id": file_id})[0]
+        if name == "load-sample":
+            return client.request("POST", f"/api/load-sample/{self.sample_id}")[0]
+        if name == "upload":
+            body, content_type = _multipart(f"loadtest-{rng.getrandbits(32):08x}.csv", self.upload_data)
+            status, response = client.request("POST", "/api/upload", body=body, headers={"Content-Type": content_type})
+            if status == 200:
+                with self._lock:
+                    self.file_ids.append(json.loads(response)["file_id"])
+            return status
+        if name == "health":
+            return client.request("GET", "/api/health")[0]
+        raise ValueError(f"unknown endpoint in mix: {name}")
+
+
+def _parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def _summary(latencies: list[float], statuses: list[int], seconds: float) -> dict:
+    ordered = sorted(latencies)
+    errors = sum(1 for status in statuses if not 200 <= status < 400)
+    status_counts = {}
+    for status in statuses:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+    if not ordered:
+        return {"requests": 0, "errors": 0, "statuses": {}}
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "statuses": status_counts,
+        "throughput_rps": round(len(ordered) / seconds, 2),
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def _event_loop_lag(client: Client, probes: int, reset: bool = False) -> list[dict]:
+    """Lag snapshots of every server worker the probes reach (one per process)."""
+    snapshots = {}
+    for _ in range(probes):
+        # A new connection per probe, so the server may route it to another worker
+        probe = Client(f"http://{client.host}:{client.port}", client.timeout)
+        status, body = probe.request("GET", "/api/metrics/event-loop", params={"reset": str(reset).lower()})
+        if status == 200:
+            snapshot = json.loads(body)
+            snapshots.setdefault(snapshot["pid"], snapshot)
+    return list(snapshots.values())
+
+
+def run(base_url: str, concurrency: int, duration: float, warmup: float, mix: dict[str, float],
+        seed: int, upload_data: bytes, timeout: float, server_workers: int) -> dict:
+    workload = Workload(Client(base_url, timeout), upload_data)
+    names, weights = list(mix), list(mix.values())
+    records: list[tuple[str, float, float, int]] = []
+    records_lock = threading.Lock()
+    started = time.perf_counter()
+    measure_from, stop_at = started + warmup, started + warmup + duration
+
+    def user(index: int):
+        rng = random.Random(f"{seed}:{index}")
+        client = Client(base_url, timeout)
+        while True:
+            sent = time.perf_counter()
+            if sent >= stop_at:
+                return
+            name = rng.choices(names, weights)[0]
+            status = workload.send(name, client, rng)
+            with records_lock:
+                records.append((name, sent, time.perf_counter() - sent, status))
+            if status == 429:
+                # Back off as asked, like a well-behaved client
+                time.sleep(max(0.0, min(client.retry_after, stop_at - time.perf_counter())))
+
+    users = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in users:
+        thread.start()
+    time.sleep(max(0.0, measure_from - time.perf_counter()))
+    _event_loop_lag(Client(base_url, timeout), probes=4 * server_workers, reset=True)
+    for thread in users:
+        thread.join()
+    lag = _event_loop_lag(Client(base_url, timeout), probes=4 * server_workers)
+
+    measured = [r for r in records if r[1] >= measure_from]
+    # Requests still in flight at the end are counted, so the window runs to the last completion
+    seconds = max((r[1] + r[2] for r in measured), default=stop_at) - measure_from
+    endpoints = {
+        name: _summary([r[2] for r in measured if r[0] == name], [r[3] for r in measured if r[0] == name], seconds)
+        for name in names
+    }
+    return {
+        "total": _summary([r[2] for r in measured], [r[3] for r in measured], seconds),
+        "endpoints": endpoints,
+        "event_loop": lag,
+        "measured_seconds": round(seconds, 2),
+    }
+
+
+def start_server(port: int, workers: int, data_dir: str) -> subprocess.Popen:
+    # WEB_CONCURRENCY sizes each worker's process pool to its share of the cores
+    env = {**os.environ, "DATA_DIR": data_dir, "WEB_CONCURRENCY": str(workers)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def wait_until_healthy(base_url: str, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if Client(base_url, 5).request("GET", "/api/health")[0] == 200:
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become healthy within {timeout:.0f}s")
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    columns = ("requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    print(f"{'endpoint':<14}" + "".join(f"{c:>16}" for c in columns))
+    rows = {**report["endpoints"], "TOTAL": report["total"]}
+    base_rows = {**baseline["endpoints"], "TOTAL": baseline["total"]} if baseline else {}
+    for name, stats in rows.items():
+        cells = []
+        for column in columns:
+            value = stats.get(column, "-")
+            before = base_rows.get(name, {}).get(column)
+            if isinstance(value, (int, float)) and before:
+                cells.append(f"{value} ({(value - before) / before:+.0%})")
+            else:
+                cells.append(str(value))
+        print(f"{name:<14}" + "".join(f"{cell:>16}" for cell in cells))
+    for snapshot in report["event_loop"]:
+        print(f"event loop (pid {snapshot['pid']}): " + ", ".join(
+            f"{key} {snapshot[key]}" for key in ("samples", "p50_ms", "p95_ms", "p99_ms", "max_ms") if key in snapshot
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the measurement")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. predict=70,analyze=10,"
+                                                          "load-sample=10,upload=10 (also: health)")
+    parser.add_argument("--upload-rows", type=int, default=0,
+                        help="rows of the synthetic CSV each upload sends (default: the bundled sample)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout in seconds")
+    parser.add_argument("--output", default="loadtest_results.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as scratch:
+        if args.upload_rows:
+            from generate_sample_data import generate_dataset
+            path = os.path.join(scratch, "upload.csv")
+            generate_dataset(path, args.upload_rows, seed=args.seed, workers=1)
+        else:
+            path = SAMPLE_CSV
+        with open(path, "rb") as f:
+            upload_data = f.read()
+
+        server = None
+        base_url = args.url
+        if base_url is None:
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(port, args.workers, os.path.join(scratch, "data"))
+        try:
+            wait_until_healthy(base_url)
+            results = run(
+                base_url, args.concurrency, args.duration, args.warmup, _parse_mix(args.mix),
+                args.seed, upload_data, args.timeout, args.workers,
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        **results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"Results -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,15 @@ export default function FileUpload({ onUpload, onLoadSample, loading }) {
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
-    accept: { 'text/csv': ['.csv'] },
+    accept: {
+      'text/csv': ['.csv'],
+      'application/x-ndjson': ['.jsonl', '.ndjson'],
+      'application/json': ['.json'],
+      'application/gzip': ['.gz'],
+      'application/x-bzip2': ['.bz2'],
+      'application/x-xz': ['.xz'],
+      'application/zstd': ['.zst'],
+    },
     maxFiles: 1,
     disabled: loading,
   })
@@ -57,7 +65,10 @@ export default function FileUpload({ onUpload, onLoadSample, loading }) {
         ) : (
           <>
             <p className="text-gray-700 dark:text-gray-300 text-lg font-medium">
-              Drag & drop a CSV file, or click to browse
+              Drag & drop a CSV, JSON or JSON Lines file, or click to browse
+            </p>
+            <p className="text-gray-400 dark:text-gray-500 text-sm mt-1">
+              Compressed .gz, .bz2, .xz and .zst files are supported
             </p>
             <p className="text-gray-400 dark:text-gray-500 text-sm mt-2">
               Must contain <code className="bg-gray-100 dark:bg-gray-700 px-1.5 py-0.5 rounded text-xs">review_text</code> and{' '}